@@ -0,0 +1,86 @@
+"""Benchmark of scalar and vectorized footprint edge computation.
+
+Compares the per segment path of the importers (one line and up to three
+get_orientation() calls per segment) with get_footprint_edges() for
+synthetic footprints and checks that both give identical results.
+
+Usage:
+
+        $ python benchmarks/bench_footprint_edges.py [number_of_footprints]
+"""
+import math
+import sys
+import timeit
+import numpy as np
+from teaser_citydb.teaser_api import footprint_edges
+
+
+def _random_footprints(number_of_footprints, seed=0):
+    """Return closed rings of random polygons with 4 to 20 points."""
+    rng = np.random.default_rng(seed)
+    footprints = []
+    for i in range(number_of_footprints):
+        number_of_points = rng.integers(4, 20)
+        points = rng.normal(size=(number_of_points, 2)) * rng.uniform(5.0, 50.0)
+        points += rng.uniform(0.0, 10000.0, size=2)
+        footprints.append([np.vstack([points, points[:1]])])
+    return footprints
+
+
+def scalar_edges(footprints):
+    """Per segment computation as done in the importers."""
+    lengths = []
+    orientations = []
+    for rings in footprints:
+        for ring in rings:
+            ring = ring.tolist()
+            for i, point in enumerate(ring):
+                try:
+                    line = (point, ring[i + 1])
+                except IndexError:
+                    continue
+                lengths.append(
+                    math.sqrt(
+                        (line[1][0] - line[0][0]) * (line[1][0] - line[0][0])
+                        + (line[1][1] - line[0][1]) * (line[1][1] - line[0][1])
+                    )
+                )
+                orientations.append(footprint_edges.get_orientation(line))
+    return lengths, orientations
+
+
+def vectorized_edges(footprints):
+    """Vectorized computation for all footprints in one call."""
+    lengths, orientations, footprint_index = footprint_edges.get_footprint_edges(
+        footprints
+    )
+    return lengths, orientations
+
+
+def main(number_of_footprints=20000, repeat=3):
+    footprints = _random_footprints(number_of_footprints)
+
+    s_lengths, s_orientations = scalar_edges(footprints)
+    v_lengths, v_orientations = vectorized_edges(footprints)
+    assert np.array_equal(np.array(s_orientations), v_orientations)
+    assert np.array_equal(np.array(s_lengths), v_lengths)
+
+    t_scalar = min(
+        timeit.repeat(lambda: scalar_edges(footprints), number=1, repeat=repeat)
+    )
+    t_vector = min(
+        timeit.repeat(lambda: vectorized_edges(footprints), number=1, repeat=repeat)
+    )
+    print(
+        "{} footprints, {} edges".format(number_of_footprints, len(s_orientations))
+    )
+    print("scalar:     {:.4f} s".format(t_scalar))
+    print("vectorized: {:.4f} s".format(t_vector))
+    print("speedup:    {:.1f}x".format(t_scalar / t_vector))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(number_of_footprints=int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,76 @@
+"""Benchmark of the cold-start import time of teaser_citydb.teaser_api.
+
+Each module is imported in a fresh interpreter, so nothing is cached in
+sys.modules. The package and the helper modules are imported without
+Django. The importers need configured Django apps, thus they are measured
+after django.setup() (set DJANGO_SETTINGS_MODULE) and the time of
+django.setup() alone is subtracted.
+
+Usage:
+
+        $ python benchmarks/bench_import_time.py [repetitions]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+WITHOUT_DJANGO = [
+    "teaser_citydb.teaser_api",
+    "teaser_citydb.teaser_api.archetypes",
+    "teaser_citydb.teaser_api.footprint_edges",
+]
+
+WITH_DJANGO = [
+    "teaser_citydb.teaser_api.import_buildings",
+    "teaser_citydb.teaser_api.to_teaser",
+    "teaser_citydb.teaser_api.to_teaser_geometry",
+    "teaser_citydb.teaser_api.to_teaser_bldg_element",
+    "teaser_citydb.teaser_api.to_teaser_window",
+    "teaser_citydb.teaser_api.to_teaser_usage_zone",
+    "teaser_citydb.teaser_api.to_teaser_errors",
+    "teaser_citydb.teaser_api.to_teaser_window_usage_zone",
+    "teaser_citydb.simulation.simulate_citymodel",
+]
+
+TIMER = """
+import time
+start = time.perf_counter()
+{setup}
+setup = time.perf_counter()
+{statement}
+end = time.perf_counter()
+print(setup - start, end - setup)
+"""
+
+
+def time_import(module, with_django=False, repetitions=5):
+    """Return median seconds of django.setup() and of importing module."""
+    code = TIMER.format(
+        setup="import django; django.setup()" if with_django else "",
+        statement="import {}".format(module),
+    )
+    setups = []
+    imports = []
+    for i in range(repetitions):
+        output = subprocess.check_output([sys.executable, "-c", code])
+        setup, duration = output.split()
+        setups.append(float(setup))
+        imports.append(float(duration))
+    return statistics.median(setups), statistics.median(imports)
+
+
+def main(repetitions=5):
+    print("{:<55} {:>10} {:>10}".format("module", "setup [s]", "import [s]"))
+    modules = [(module, False) for module in WITHOUT_DJANGO]
+    if os.environ.get("DJANGO_SETTINGS_MODULE"):
+        modules += [(module, True) for module in WITH_DJANGO]
+    else:
+        print("DJANGO_SETTINGS_MODULE is not set, skipping importers")
+    for module, with_django in modules:
+        setup, duration = time_import(module, with_django, repetitions)
+        print("{:<55} {:>10.4f} {:>10.4f}".format(module, setup, duration))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
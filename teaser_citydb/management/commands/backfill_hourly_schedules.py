@@ -0,0 +1,30 @@
+"""Command to materialize hourly values of existing schedules."""
+from django.core.management.base import BaseCommand
+import teaser_citydb.teaser_api.hourly_schedules as hourly_schedules
+
+
+class Command(BaseCommand):
+    """Store hourly values of schedule time series in HourlySchedule.
+
+    Usage: python manage.py backfill_hourly_schedules [file_id ...] [--overwrite]
+    """
+
+    help = "Materialize hourly values of schedule time series for TEASER imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file_ids",
+            nargs="*",
+            help="file_ids of the schedules, all schedules if none are given",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Recompute schedules that are already materialized",
+        )
+
+    def handle(self, *args, **options):
+        stored = hourly_schedules.backfill_hourly_schedules(
+            file_ids=options["file_ids"] or None, overwrite=options["overwrite"]
+        )
+        self.stdout.write("Stored {} hourly schedules".format(len(stored)))
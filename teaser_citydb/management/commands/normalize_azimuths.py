@@ -0,0 +1,31 @@
+"""Command to set missing azimuths of roofs and ground slabs."""
+from django.core.management.base import BaseCommand
+from citydb.models import CityModel
+import teaser_citydb.teaser_api.boundary_defaults as boundary_defaults
+
+
+class Command(BaseCommand):
+    """Set missing azimuths of roofs and ground slabs with one UPDATE.
+
+    Usage: python manage.py normalize_azimuths [city_model_name ...]
+    """
+
+    help = "Set missing azimuths of roofs and ground slabs to the default azimuth."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "city_models",
+            nargs="*",
+            help="names of the city models, all boundaries if none are given",
+        )
+
+    def handle(self, *args, **options):
+        if not options["city_models"]:
+            updated = boundary_defaults.normalize_azimuths()
+        else:
+            updated = 0
+            for name in options["city_models"]:
+                updated += boundary_defaults.normalize_azimuths(
+                    city_model=CityModel.objects.get(name=name)
+                )
+        self.stdout.write("Updated {} thermal boundaries".format(updated))
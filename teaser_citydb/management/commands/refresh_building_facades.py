@@ -0,0 +1,44 @@
+"""Command to fill the precomputed facades of buildings."""
+from django.core.management.base import BaseCommand
+from citydb.models import CityModel
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+
+
+class Command(BaseCommand):
+    """Compute and store the facades of buildings in BuildingFacade.
+
+    Run it after the geometries of buildings were imported or changed.
+    Requires PostGIS 3.2 or newer.
+
+    Usage: python manage.py refresh_building_facades [city_model_name ...]
+    """
+
+    help = "Compute and store the footprint facades of buildings for TEASER imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "city_models",
+            nargs="*",
+            help="names of the city models, all buildings if none are given",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=prefetch.CHUNK_SIZE,
+            help="number of buildings that are refreshed together",
+        )
+
+    def handle(self, *args, **options):
+        if not options["city_models"]:
+            refreshed = footprint_facades.refresh_city_model_facades(
+                chunk_size=options["chunk_size"]
+            )
+        else:
+            refreshed = 0
+            for name in options["city_models"]:
+                refreshed += footprint_facades.refresh_city_model_facades(
+                    city_model=CityModel.objects.get(name=name),
+                    chunk_size=options["chunk_size"],
+                )
+        self.stdout.write("Stored facades of {} buildings".format(refreshed))
@@ -0,0 +1,26 @@
+"""Command to write the importer inputs of a city model to a snapshot."""
+from django.core.management.base import BaseCommand
+from citydb.models import CityModel
+import teaser_citydb.teaser_api.snapshot as snapshot
+
+
+class Command(BaseCommand):
+    """Write a Parquet snapshot of a city model for imports without database.
+
+    Usage: python manage.py snapshot city_model_name path
+    """
+
+    help = "Write the inputs of the TEASER importers of a city model to Parquet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("city_model", help="name of the city model")
+        parser.add_argument("path", help="path of the Parquet file")
+
+    def handle(self, *args, **options):
+        number_of_buildings = snapshot.write_snapshot(
+            city_model=CityModel.objects.get(name=options["city_model"]),
+            path=options["path"],
+        )
+        self.stdout.write(
+            "Stored {} buildings in {}".format(number_of_buildings, options["path"])
+        )
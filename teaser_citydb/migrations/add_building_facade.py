@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citydb', '__first__'),
+        ('teaser_citydb', 'add_time_series_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingFacade',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('orientation', models.FloatField()),
+                ('facade_length', models.FloatField()),
+                ('footprint_area', models.FloatField()),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teaser_facades', to='citydb.EnergyBuilding')),
+            ],
+            options={
+                'db_table': 'teas_building_facade',
+                'ordering': ['building', 'position'],
+                'managed': True,
+                'unique_together': {('building', 'orientation')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='buildingfacade',
+            index=models.Index(fields=['building', 'position'], name='teas_facade_bldg_pos_idx'),
+        ),
+    ]
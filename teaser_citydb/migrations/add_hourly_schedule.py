@@ -0,0 +1,75 @@
+from datetime import datetime as dt
+import django.contrib.postgres.fields
+from django.db import migrations, models
+from teaser.data.input import usecond_input
+from teaser.logic.buildingobjects.useconditions import UseConditions
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+
+# Columns of the schedules of TEASER and suffix of their file_id, as written
+# in add_time_series_zone
+SCHEDULES = [
+    ("heating_profile", "heating_schedule"),
+    ("cooling_profile", "cooling_schedule"),
+    ("persons_profile", "occupants"),
+    ("machines_profile", "machines"),
+    ("lighting_profile", "lighting"),
+]
+
+
+def hourly_schedule_data(apps, schema_editor):
+    """Materialize hourly values of the standard TEASER schedules.
+
+    The values are taken from the use conditions of TEASER (the source of
+    add_time_series_zone), thus only historical models are used. Schedules
+    written later (e.g. by from_teaser) are materialized with the command
+    backfill_hourly_schedules.
+    """
+    HourlySchedule = apps.get_model("teaser_citydb", "HourlySchedule")
+    IrregularTimeSeriesFile = apps.get_model("citydb", "IrregularTimeSeriesFile")
+    existing = set(
+        IrregularTimeSeriesFile.objects.filter(
+            thematic_description="Schedule"
+        ).values_list("file_id", flat=True)
+    )
+    data_class = teaser_data.get_data()
+    for usage_zone in data_class.conditions_bind.keys():
+        if usage_zone != "version":
+            uc = UseConditions(parent=None)
+            usecond_input.load_use_conditions(
+                use_cond=uc, zone_usage=usage_zone, data_class=data_class
+            )
+            for column, suffix in SCHEDULES:
+                file_id = "{}_{}".format(uc.usage, suffix)
+                if file_id in existing:
+                    HourlySchedule.objects.update_or_create(
+                        file_id=file_id,
+                        defaults={
+                            "start": dt(2014, 1, 1, 0, 0, 0),
+                            "values": [float(value) for value in uc.schedules[column]],
+                        },
+                    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citydb', '__first__'),
+        ('teaser_citydb', 'add_building_facade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlySchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=4000, unique=True)),
+                ('start', models.DateTimeField()),
+                ('values', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+            ],
+            options={
+                'db_table': 'teas_hourly_schedule',
+                'managed': True,
+            },
+        ),
+        migrations.RunPython(hourly_schedule_data, migrations.RunPython.noop),
+    ]
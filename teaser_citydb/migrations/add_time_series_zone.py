@@ -4,20 +4,20 @@ from __future__ import unicode_literals
 
 from django.db import migrations
 from citydb.shortcuts import time_series_data
-from teaser.project import Project
 from teaser.data.input import usecond_input
 from teaser.logic.buildingobjects.useconditions import UseConditions
+import teaser_citydb.teaser_api.teaser_data as teaser_data
 import pandas as pd
 
 # Add units
 def time_series_usage_zone(apps, schema_editor):
     """Write time series for usage zones."""
-    prj = Project(load_data=True)
-    for usage_zone, data in prj.data.conditions_bind.items():
+    data_class = teaser_data.get_data()
+    for usage_zone, data in data_class.conditions_bind.items():
         if usage_zone != "version":
             uc = UseConditions(parent=None)
             usecond_input.load_use_conditions(
-                use_cond=uc, zone_usage=usage_zone, data_class=prj.data
+                use_cond=uc, zone_usage=usage_zone, data_class=data_class
             )
             uc.schedules.index = pd.date_range(
                 "2014-01-01 00:00:00", periods=8760, freq="H"
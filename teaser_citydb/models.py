@@ -2,3 +2,6 @@
 
 from teaser_citydb.modules.bwzkmapping import BWZKMapping
 from teaser_citydb.modules.usagemapping import UsageMapping
+from teaser_citydb.modules.mappingregistry import mapping_registry
+from teaser_citydb.modules.buildingfacade import BuildingFacade
+from teaser_citydb.modules.hourlyschedule import HourlySchedule
@@ -0,0 +1,53 @@
+"""This module contains the precomputed facade table for TEASER imports."""
+
+from django.contrib.gis.db import models
+from citydb.models import EnergyBuilding
+
+
+class BuildingFacade(models.Model):
+    """ORM class for the precomputed facade of a building.
+
+    This class contains one row per building and snapped orientation of the
+    footprint edges. The rows are computed in PostGIS by
+    teaser_api.footprint_facades and refreshed explicitly (command
+    refresh_building_facades or refresh_facades of from_teaser) after the
+    geometries of buildings changed. The geometry based importers read the
+    table instead of splitting the footprints on each import run.
+
+    Parameters
+    ----------
+    building : EnergyBuilding
+        Building the facade belongs to
+    position : int
+        Position of the orientation in the order of the first footprint edge
+    orientation : float
+        Snapped orientation of the facade in degree
+    facade_length : float
+        Summed length of all footprint edges with this orientation
+    footprint_area : float
+        Area of the footprint of the building (identical for all rows of a
+        building)
+
+    """
+
+    building = models.ForeignKey(
+        EnergyBuilding, on_delete=models.CASCADE, related_name="teaser_facades"
+    )
+    position = models.IntegerField()
+    orientation = models.FloatField()
+    facade_length = models.FloatField()
+    footprint_area = models.FloatField()
+
+    class Meta:
+        """Meta Class from Django."""
+
+        managed = True
+        db_table = "teas_building_facade"
+        ordering = ["building", "position"]
+        unique_together = [("building", "orientation")]
+        indexes = [
+            models.Index(
+                fields=["building", "position"], name="teas_facade_bldg_pos_idx"
+            )
+        ]
+
@@ -0,0 +1,36 @@
+"""This module contains the materialized hourly schedules for TEASER."""
+
+from django.contrib.gis.db import models
+from django.contrib.postgres.fields import ArrayField
+
+
+class HourlySchedule(models.Model):
+    """ORM class for hourly schedule values.
+
+    This class contains the hourly values of a schedule time series file as
+    one array. Schedules are stored when they are written to the database,
+    thus importers read them with one indexed lookup on file_id and do not
+    need to resample the time series.
+
+
+    Parameters
+    ----------
+    file_id : str
+        file_id of the IrregularTimeSeriesFile of the schedule, e.g.
+        'Living_occupants'
+    start : datetime
+        Time of the first value
+    values : list
+        Hourly mean values of the schedule starting at start
+
+    """
+
+    file_id = models.CharField(max_length=4000, unique=True)
+    start = models.DateTimeField()
+    values = ArrayField(models.FloatField())
+
+    class Meta:
+        """Meta Class from Django."""
+
+        managed = True
+        db_table = "teas_hourly_schedule"
@@ -0,0 +1,132 @@
+"""This module contains the process-wide registry for TEASER mappings."""
+
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from teaser_citydb.modules.bwzkmapping import BWZKMapping
+from teaser_citydb.modules.usagemapping import UsageMapping
+
+
+class MappingRegistry(object):
+    """In-memory registry for BWZK and usage zone mappings.
+
+    Both mapping tables are small and rarely change. The registry loads each
+    table with one query on first access and answers all further lookups
+    from a dictionary. Saving or deleting a mapping invalidates the registry
+    through Django signals, so the next lookup reloads the table.
+
+    Attributes
+    ----------
+    archetypes : dict
+        Mapping of BWZK number to archetype name of TEASER
+    usage_zones : dict
+        Mapping of DIN 277-2 classification to usage zone name of TEASER
+
+    """
+
+    def __init__(self):
+        """Init function of MappingRegistry."""
+        self._archetypes = None
+        self._usage_zones = None
+
+    @property
+    def archetypes(self):
+        if self._archetypes is None:
+            self._archetypes = dict(
+                BWZKMapping.objects.values_list("bwzk", "archetype")
+            )
+        return self._archetypes
+
+    @property
+    def usage_zones(self):
+        if self._usage_zones is None:
+            self._usage_zones = dict(
+                UsageMapping.objects.values_list("din_277", "usage_zone")
+            )
+        return self._usage_zones
+
+    def get_archetype(self, bwzk):
+        """Return the archetype name of TEASER for a BWZK number.
+
+        Parameters
+        ----------
+        bwzk : str
+            BWZK number of the building (function of the building)
+
+        Returns
+        -------
+        archetype : str
+            Name of archetype building in TEASER, None if the BWZK number is
+            mapped to no archetype.
+
+        Raises
+        ------
+        BWZKMapping.DoesNotExist
+            If the BWZK number is not in the mapping table.
+
+        """
+        try:
+            return self.archetypes[bwzk]
+        except KeyError:
+            raise BWZKMapping.DoesNotExist("No BWZK mapping for bwzk {}".format(bwzk))
+
+    def get_usage_zone(self, din_277):
+        """Return the usage zone name of TEASER for a DIN 277-2 class.
+
+        Parameters
+        ----------
+        din_277 : str
+            DIN 277-2 classification of the usage zone
+
+        Returns
+        -------
+        usage_zone : str
+            Name of usage_zone in TEASER.
+
+        Raises
+        ------
+        UsageMapping.DoesNotExist
+            If the classification is not in the mapping table.
+
+        """
+        try:
+            return self.usage_zones[din_277]
+        except KeyError:
+            raise UsageMapping.DoesNotExist(
+                "No usage mapping for din_277 {}".format(din_277)
+            )
+
+    def set_mappings(self, archetypes, usage_zones):
+        """Use the given mappings instead of loading the mapping tables.
+
+        Used to import buildings from a snapshot without database, see
+        teaser_api.snapshot. The mappings are kept until invalidate() is
+        called.
+
+        Parameters
+        ----------
+        archetypes : dict
+            Mapping of BWZK number to archetype name of TEASER
+        usage_zones : dict
+            Mapping of DIN 277-2 classification to usage zone name of TEASER
+
+        """
+        self._archetypes = dict(archetypes)
+        self._usage_zones = dict(usage_zones)
+
+    def invalidate(self):
+        """Drop all cached mappings, they are reloaded on next access."""
+        self._archetypes = None
+        self._usage_zones = None
+
+
+mapping_registry = MappingRegistry()
+
+
+@receiver(post_save, sender=BWZKMapping)
+@receiver(post_delete, sender=BWZKMapping)
+@receiver(post_save, sender=UsageMapping)
+@receiver(post_delete, sender=UsageMapping)
+def _invalidate_mapping_registry(sender, **kwargs):
+    """Invalidate the registry whenever a mapping is changed."""
+    mapping_registry.invalidate()
@@ -0,0 +1,83 @@
+"""Optional database router to read importer queries from a replica.
+
+The to_teaser* importers only read from the database, while from_teaser
+and the upload of simulation results write to it. With a streaming replica
+of PostgreSQL, the reads can be moved to the replica, thus a large
+ingestion of results does not slow down concurrent imports.
+
+Reads inside read_from_replica() go to the replica, all other queries and
+all writes go to the primary. The importers (import_buildings,
+import_variants, iter_teaser_buildings and to_teaser) run all their queries
+inside read_from_replica(). Existence checks that guard a write (e.g. in
+read_results) stay on the primary, because a row written just before may
+not yet be on the replica. Without a configured replica the router does
+nothing. Example settings with two database aliases (the replica mirrors
+the primary in tests, see test_settings):
+
+    DATABASES = {
+        "default": {...},
+        "replica": {..., "TEST": {"MIRROR": "default"}},
+    }
+    DATABASE_ROUTERS = ["teaser_citydb.routers.ReplicaRouter"]
+    TEASER_CITYDB_REPLICA = "replica"  # default: "replica"
+    TEASER_CITYDB_PRIMARY = "default"  # default: "default"
+"""
+import contextlib
+import threading
+from django.conf import settings
+
+DEFAULT_REPLICA = "replica"
+DEFAULT_PRIMARY = "default"
+
+_state = threading.local()
+
+
+def get_replica_alias():
+    """Return the alias of the replica, None if it is not configured."""
+    alias = getattr(settings, "TEASER_CITYDB_REPLICA", DEFAULT_REPLICA)
+    if alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def get_primary_alias():
+    """Return the alias of the primary database."""
+    return getattr(settings, "TEASER_CITYDB_PRIMARY", DEFAULT_PRIMARY)
+
+
+@contextlib.contextmanager
+def read_from_replica():
+    """Send reads of the current thread to the replica.
+
+    Can be nested and used as decorator. Worker processes that are forked
+    inside the block inherit the setting.
+    """
+    previous = getattr(_state, "replica", False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+class ReplicaRouter(object):
+    """Send reads inside read_from_replica() to the replica, writes to primary."""
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, "replica", False):
+            return get_replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return get_primary_alias()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {get_primary_alias(), get_replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_replica_alias():
+            return False
+        return None
@@ -42,6 +42,8 @@ def _upload_time_series(
     }
 
     try:
+        # checked on the primary, a file uploaded just before may not yet be
+        # on the replica
         IrregularTimeSeriesFile.objects.get(
             file_id="{}_{}_{}".format(bldg.gmlid, conversion_system, end_use)
         )
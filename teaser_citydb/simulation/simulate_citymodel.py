@@ -1,11 +1,8 @@
 """Module to simulate buildings"""
 import os
-import django
 import datetime
 import pandas as pd
 import multiprocessing
-
-django.setup()
 from citydb.shortcuts import buildings_data as bd_short
 import teaser_citydb.simulation.simulate_models as sim
 import teaser_citydb.simulation.read_results as read
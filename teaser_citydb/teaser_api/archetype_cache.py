@@ -0,0 +1,103 @@
+"""Module to memoize the generation of archetype buildings.
+
+Many buildings of a city model share archetype class, year of construction,
+net leased area, number of floors and height of floors and thus generate
+identical elements with generate_archetype(). The first building of each
+combination is generated as usual and kept as template, all further
+buildings are deep copies of the template that are only renamed.
+"""
+import copy
+from collections import namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "currsize"])
+
+
+class ArchetypeCache(object):
+    """Cache of generated archetype buildings of TEASER.
+
+    Attributes
+    ----------
+    hits : int
+        Number of buildings copied from a template
+    misses : int
+        Number of buildings generated with generate_archetype()
+
+    """
+
+    def __init__(self):
+        """Init function of ArchetypeCache."""
+        self.hits = 0
+        self.misses = 0
+        self._templates = {}
+
+    @staticmethod
+    def get_key(bl_class, **kwargs):
+        """Return the cache key of an archetype building.
+
+        Parameters
+        ----------
+        bl_class : class
+            Archetype class of TEASER
+        kwargs : dict
+            Keyword arguments of the archetype class except parent and name
+
+        """
+        return (bl_class,) + tuple(sorted(kwargs.items()))
+
+    @staticmethod
+    def _copy(bldg, project):
+        """Return a deep copy of bldg without copying its project."""
+        memo = {id(bldg.parent): project}
+        if bldg.parent is not None:
+            memo[id(bldg.parent.data)] = project.data
+        return copy.deepcopy(bldg, memo)
+
+    def generate_archetype(self, bl_class, project, name, **kwargs):
+        """Add an archetype building to a project.
+
+        Parameters
+        ----------
+        bl_class : class
+            Archetype class of TEASER, e.g. Office
+        project : teaser.Project()
+            Project instance of TEASER the building is added to.
+        name : str
+            Name of the building
+        kwargs : dict
+            Further keyword arguments of the archetype class, e.g.
+            year_of_construction, net_leased_area, number_of_floors,
+            height_of_floors
+
+        Returns
+        -------
+        bldg : teaser.Building()
+            Generated or copied building with parent project
+
+        """
+        key = self.get_key(bl_class, **kwargs)
+        template = self._templates.get(key)
+        if template is None:
+            self.misses += 1
+            bldg = bl_class(parent=project, name=name, **kwargs)
+            bldg.generate_archetype()
+            self._templates[key] = self._copy(bldg, project)
+            return bldg
+
+        self.hits += 1
+        bldg = self._copy(template, project)
+        bldg.name = name
+        bldg.parent = project
+        return bldg
+
+    def cache_info(self):
+        """Return hits, misses and number of templates of the cache."""
+        return CacheInfo(self.hits, self.misses, len(self._templates))
+
+    def clear(self):
+        """Drop all templates and reset the counters."""
+        self._templates.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+archetype_cache = ArchetypeCache()
@@ -0,0 +1,105 @@
+"""Module with the registry of archetype classes of TEASER.
+
+The archetype classes are resolved lazily on first use, thus importing the
+importers does not import all archetype modules of TEASER.
+"""
+import importlib
+
+ARCHETYPES = {
+    "Office": {
+        "method": "bmvbs",
+        "module": "teaser.logic.archetypebuildings.bmvbs.office",
+        "teaser_class": "Office",
+    },
+    "Institute": {
+        "method": "bmvbs",
+        "module": "teaser.logic.archetypebuildings.bmvbs.custom.institute",
+        "teaser_class": "Institute",
+    },
+    "Institute4": {
+        "method": "bmvbs",
+        "module": "teaser.logic.archetypebuildings.bmvbs.custom.institute4",
+        "teaser_class": "Institute4",
+    },
+    "Institute8": {
+        "method": "bmvbs",
+        "module": "teaser.logic.archetypebuildings.bmvbs.custom.institute8",
+        "teaser_class": "Institute8",
+    },
+    "Building": {
+        "method": "undefined",
+        "module": "teaser.logic.buildingobjects.building",
+        "teaser_class": "Building",
+    },
+    "SingleFamilyDwelling": {
+        "method": "iwu",
+        "module": "teaser.logic.archetypebuildings.bmvbs.singlefamilydwelling",
+        "teaser_class": "SingleFamilyDwelling",
+    },
+    "SingleFamilyHouse": {
+        "method": "tabula_de",
+        "module": "teaser.logic.archetypebuildings.tabula.de.singlefamilyhouse",
+        "teaser_class": "SingleFamilyHouse",
+    },
+    "TerracedHouse": {
+        "method": "tabula_de",
+        "module": "teaser.logic.archetypebuildings.tabula.de.terracedhouse",
+        "teaser_class": "TerracedHouse",
+    },
+    "MultiFamilyHouse": {
+        "method": "tabula_de",
+        "module": "teaser.logic.archetypebuildings.tabula.de.multifamilyhouse",
+        "teaser_class": "MultiFamilyHouse",
+    },
+    "ApartmentBlock": {
+        "method": "tabula_de",
+        "module": "teaser.logic.archetypebuildings.tabula.de.apartmentblock",
+        "teaser_class": "ApartmentBlock",
+    },
+}
+
+# The usage zone importers use SingleFamilyDwelling for all residential
+# archetypes of TABULA.
+USAGE_ZONE_ARCHETYPES = dict(
+    ARCHETYPES,
+    **{
+        name: dict(ARCHETYPES["SingleFamilyDwelling"], method="tabula_de")
+        for name in [
+            "SingleFamilyHouse",
+            "TerracedHouse",
+            "MultiFamilyHouse",
+            "ApartmentBlock",
+        ]
+    }
+)
+
+_classes = {}
+
+
+def get_archetype_class(archetype, archetypes=ARCHETYPES):
+    """Return the archetype class of TEASER, import it on first use.
+
+    Parameters
+    ----------
+    archetype : str
+        Name of archetype building in TEASER, e.g. 'Office'
+    archetypes : dict
+        Registry of archetypes (default: ARCHETYPES)
+
+    Returns
+    -------
+    teaser_class : class
+        Archetype class of TEASER
+
+    Raises
+    ------
+    KeyError
+        If the archetype is not in the registry.
+
+    """
+    entry = archetypes[archetype]
+    key = (entry["module"], entry["teaser_class"])
+    if key not in _classes:
+        module = importlib.import_module(entry["module"])
+        _classes[key] = getattr(module, entry["teaser_class"])
+    return _classes[key]
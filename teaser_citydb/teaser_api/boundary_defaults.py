@@ -0,0 +1,75 @@
+"""Module with defaults for missing attributes of thermal boundaries.
+
+Roofs and ground slabs are often stored without azimuth. The importers
+apply the default in memory and never write to the database, thus imports
+are read-only and can run in parallel without row locks. The stored data
+can be normalized separately with normalize_azimuths(), which fixes all
+boundaries of a city model with one set-based UPDATE (see the management
+command normalize_azimuths).
+"""
+from citydb.models import EnergyBuilding
+from citydb.models import ThermalBoundary
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+
+DEFAULT_AZIMUTH = 0.0
+
+# Types of thermal boundaries whose missing azimuth is replaced by the default
+HORIZONTAL_BOUNDARIES = ["Roof", "GroundSlab"]
+
+
+def get_azimuth(bound):
+    """Return the azimuth of a thermal boundary, DEFAULT_AZIMUTH if None.
+
+    Parameters
+    ----------
+    bound : ThermalBoundary instance
+        Thermal boundary, e.g. a roof or ground slab
+
+    Returns
+    -------
+    azimuth : float
+        Azimuth of the boundary in degree
+
+    """
+    if bound.azimuth is None:
+        return DEFAULT_AZIMUTH
+    return float(bound.azimuth)
+
+
+def normalize_azimuths(city_model=None, bbox=None, polygon=None):
+    """Set missing azimuths of roofs and ground slabs to DEFAULT_AZIMUTH.
+
+    All boundaries are updated with a single UPDATE statement, the
+    selection of the boundaries is a subquery of that statement.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        Only boundaries of buildings of this city model are normalized. If
+        None, all boundaries in the database are normalized. (default: None)
+    bbox : tuple
+        Bounding box (xmin, ymin, xmax, ymax), see
+        prefetch_buildings.get_city_buildings(), only used with city_model
+        (default: None)
+    polygon : GEOSGeometry
+        Polygon of the region, see prefetch_buildings.get_city_buildings(),
+        only used with city_model (default: None)
+
+    Returns
+    -------
+    updated : int
+        Number of updated thermal boundaries
+
+    """
+    boundaries = ThermalBoundary.objects.filter(
+        azimuth__isnull=True, thermal_boundary_type__in=HORIZONTAL_BOUNDARIES
+    )
+    if city_model is not None:
+        building_ids = prefetch.get_city_buildings(
+            city_model=city_model, bbox=bbox, polygon=polygon
+        ).values("building_obj__building_energy_obj")
+        boundary_ids = EnergyBuilding.objects.filter(pk__in=building_ids).values(
+            "thermal_zones__thermal_boundary_obj"
+        )
+        boundaries = boundaries.filter(pk__in=boundary_ids)
+    return boundaries.update(azimuth=DEFAULT_AZIMUTH, azimuth_uom="deg")
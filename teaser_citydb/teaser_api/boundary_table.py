@@ -0,0 +1,165 @@
+"""Module to extract the thermal boundaries of buildings as columnar table.
+The element importers need the area of each boundary and opening scaled
+from the thermal zone to the building (area * floor area of the building /
+floor area of the zone), its azimuth, tilt and u-value. Instead of
+converting Decimal values boundary by boundary, the boundaries and openings
+of a chunk of buildings are fetched with one values_list() query, converted
+and scaled with NumPy, and split into rows per building and boundary type.
+
+As in the importers, only the boundaries of the first thermal zone (lowest
+primary key) of each building are part of the table.
+"""
+import collections
+from collections import namedtuple
+import numpy as np
+from citydb.models import EnergyBuilding
+
+BoundaryRow = namedtuple(
+    "BoundaryRow", ["pk", "area", "azimuth", "tilt", "u_value", "windows"]
+)
+WindowRow = namedtuple("WindowRow", ["area", "u_value"])
+
+_ZONE = "thermal_zones__"
+_BOUND = "thermal_zones__thermal_boundary_obj__"
+
+COLUMNS = [
+    "pk",
+    "floor_area",
+    _ZONE + "pk",
+    _ZONE + "floor_area",
+    _BOUND + "pk",
+    _BOUND + "thermal_boundary_type",
+    _BOUND + "area",
+    _BOUND + "azimuth",
+    _BOUND + "inclination",
+    _BOUND + "construction__u_value",
+    _BOUND + "contains__pk",
+    _BOUND + "contains__area",
+    _BOUND + "contains__construction__u_value",
+]
+
+
+def _to_float(values):
+    """Return a float array of Decimal values, None is converted to NaN."""
+    return np.array(values, dtype=float)
+
+
+def _to_list(values):
+    """Return a list of floats of an array, NaN is converted to None."""
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def get_boundary_tables(building_ids):
+    """Return the scaled thermal boundaries of buildings.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    tables : dict
+        Dictionary with BuildingEnergy primary key as key and a dictionary
+        of thermal boundary type and list of BoundaryRow as value. The rows
+        are ordered by primary key of the boundary, area is scaled to the
+        building, azimuth is None if missing and windows is a list of
+        WindowRow of the openings of the boundary with scaled area.
+
+    """
+    rows = (
+        EnergyBuilding.objects.filter(pk__in=building_ids)
+        .values_list(*COLUMNS)
+        .order_by("pk", _ZONE + "pk", _BOUND + "pk", _BOUND + "contains__pk")
+    )
+    rows = [row for row in rows if row[2] is not None]
+    if not rows:
+        return {}
+    columns = list(zip(*rows))
+
+    building = _to_float(columns[0])
+    zone = _to_float(columns[2])
+    bound = _to_float(columns[4])
+    window = _to_float(columns[10])
+
+    # rows are ordered by zone, thus the first row of a building belongs to
+    # its first zone
+    buildings, first_rows = np.unique(building, return_index=True)
+    first_zone = zone[first_rows][np.searchsorted(buildings, building)]
+    in_first_zone = (zone == first_zone) & ~np.isnan(bound)
+
+    scale = _to_float(columns[1]) / _to_float(columns[3])
+    area = _to_float(columns[6]) * scale
+    azimuth = _to_list(_to_float(columns[7]))
+    tilt = _to_float(columns[8]).tolist()
+    u_value = _to_float(columns[9]).tolist()
+    window_area = (_to_float(columns[11]) * scale).tolist()
+    window_u_value = _to_float(columns[12]).tolist()
+
+    new_bound = np.ones(len(rows), dtype=bool)
+    new_bound[1:] = (bound[1:] != bound[:-1]) | (building[1:] != building[:-1])
+    has_window = ~np.isnan(window)
+
+    area = area.tolist()
+    tables = {}
+    boundary = None
+    for i in np.flatnonzero(in_first_zone).tolist():
+        if new_bound[i]:
+            boundary = BoundaryRow(
+                pk=rows[i][4],
+                area=area[i],
+                azimuth=azimuth[i],
+                tilt=tilt[i],
+                u_value=u_value[i],
+                windows=[],
+            )
+            table = tables.setdefault(rows[i][0], collections.OrderedDict())
+            table.setdefault(columns[5][i], []).append(boundary)
+        if has_window[i]:
+            boundary.windows.append(
+                WindowRow(area=window_area[i], u_value=window_u_value[i])
+            )
+    return tables
+
+
+def annotate_boundary_tables(building_energies):
+    """Attach the boundary table to BuildingEnergy objects.
+
+    Sets the attribute boundary_table of each building, see
+    get_boundary_tables(). Used as annotation in
+    prefetch_buildings.iter_building_chunks().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    tables = get_boundary_tables([bldg.pk for bldg in building_energies])
+    for bldg in building_energies:
+        bldg.boundary_table = tables.get(bldg.pk, collections.OrderedDict())
+
+
+def get_building_boundaries(building_energy):
+    """Return the scaled thermal boundaries of a building.
+
+    Uses the result of annotate_boundary_tables() if present, otherwise the
+    table of the building is fetched.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building the boundaries are returned for
+
+    Returns
+    -------
+    table : dict
+        Dictionary of thermal boundary type and list of BoundaryRow
+
+    """
+    table = getattr(building_energy, "boundary_table", None)
+    if table is None:
+        table = get_boundary_tables([building_energy.pk]).get(
+            building_energy.pk, collections.OrderedDict()
+        )
+    return table
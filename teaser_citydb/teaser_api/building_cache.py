@@ -0,0 +1,234 @@
+"""Module to cache generated TEASER buildings on disk.
+
+Re-running an import after editing a few buildings regenerates every
+building of the city model. CachedImport wraps an _import_building_*
+function and stores each generated building with the JSON routines of
+TEASER, keyed by gmlid, import function and a fingerprint of the source
+data. Buildings with unchanged fingerprint are loaded from the cache, only
+changed buildings are generated again.
+
+The fingerprint covers everything the import function reads: all fields
+of the BuildingEnergy row, all fields of the related rows prefetched for the
+import (zones, boundaries, constructions, layers, ...), the data attached by
+the annotations of the chunk (boundary table, footprint, facades, window
+areas, see ANNOTATION_ATTRIBUTES), the BWZK and usage zone mappings and the
+import function. Thus editing any of these rows invalidates the cache entry
+of the building.
+"""
+import datetime
+import decimal
+import glob
+import hashlib
+import json
+import os
+from teaser_citydb.models import mapping_registry
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+
+CACHE_VERSION = 2
+
+# Attributes set by the annotations of prefetch_buildings.iter_building_chunks()
+ANNOTATION_ATTRIBUTES = [
+    "building_class",
+    "boundary_table",
+    "footprint_shape",
+    "footprint_facade",
+    "window_areas",
+]
+
+
+def _json_default(value):
+    """Serialize values of model fields that json does not know."""
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _get_fields(obj):
+    """Return attribute name and value of all concrete fields of a row."""
+    return [
+        (field.attname, getattr(obj, field.attname))
+        for field in obj._meta.concrete_fields
+    ]
+
+
+def _get_related_rows(obj, seen):
+    """Return the fields of all related rows loaded with obj, recursively.
+
+    Follows the prefetched relations and the cached forward relations. Rows
+    in seen are skipped, thus back references to the parent row do not
+    recurse.
+    """
+    cached = dict(getattr(obj, "_prefetched_objects_cache", {}))
+    cached.update(obj._state.fields_cache)
+    rows = []
+    for name in sorted(cached):
+        related = cached[name]
+        if related is None:
+            rows.append([name, None])
+            continue
+        if not isinstance(related, (list, tuple)) and hasattr(related, "_meta"):
+            related = [related]
+        for related_obj in related:
+            if id(related_obj) in seen:
+                continue
+            seen.add(id(related_obj))
+            rows.append(
+                [
+                    name,
+                    _get_fields(related_obj),
+                    _get_related_rows(related_obj, seen),
+                ]
+            )
+    return rows
+
+
+def get_mapping_version():
+    """Return a hash of the BWZK and usage zone mappings."""
+    mappings = [
+        sorted(mapping_registry.archetypes.items(), key=str),
+        sorted(mapping_registry.usage_zones.items(), key=str),
+    ]
+    return hashlib.sha1(
+        json.dumps(mappings, default=_json_default).encode("utf-8")
+    ).hexdigest()
+
+
+def get_fingerprint(building_energy, mode, mapping_version=None):
+    """Return the fingerprint of the source data of a building.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building the fingerprint is computed for
+    mode : str
+        Name of the import function or mode
+    mapping_version : str
+        Result of get_mapping_version(), computed if None (default: None)
+
+    Returns
+    -------
+    fingerprint : str
+        SHA1 hex digest
+
+    """
+    if mapping_version is None:
+        mapping_version = get_mapping_version()
+    fields = _get_fields(building_energy)
+    related_rows = _get_related_rows(building_energy, {id(building_energy)})
+    annotations = [
+        (name, getattr(building_energy, name))
+        for name in ANNOTATION_ATTRIBUTES
+        if hasattr(building_energy, name)
+    ]
+    source = [CACHE_VERSION, mode, mapping_version, fields, related_rows, annotations]
+    return hashlib.sha1(
+        json.dumps(source, default=_json_default).encode("utf-8")
+    ).hexdigest()
+
+
+class CachedImport(object):
+    """Import function with on-disk cache of generated buildings.
+
+    Instances can be used everywhere an _import_building_* function is
+    expected, e.g. as import_function of import_buildings().
+
+    Parameters
+    ----------
+    import_function : _import_building_* function
+        Function of one of the to_teaser_* modules that imports a single
+        building into a TEASER project.
+    cache_dir : str
+        Directory of the cache, one sub directory per import function
+
+    Attributes
+    ----------
+    hits : int
+        Number of buildings loaded from the cache
+    misses : int
+        Number of buildings generated by import_function
+
+    """
+
+    def __init__(self, import_function, cache_dir):
+        """Init function of CachedImport."""
+        self.import_function = import_function
+        self.mode = "{}.{}".format(import_function.__module__, import_function.__name__)
+        self.cache_dir = os.path.join(cache_dir, self.mode)
+        self.hits = 0
+        self.misses = 0
+        self._mapping_version = None
+
+    def _get_path(self, gmlid, fingerprint):
+        """Return the path of a cache entry without file extension."""
+        safe_gmlid = "".join(c if c.isalnum() or c in "-_." else "_" for c in gmlid)
+        return os.path.join(self.cache_dir, "{}_{}".format(safe_gmlid, fingerprint))
+
+    def __call__(self, building_energy, project, buildings_not_generated):
+        """Import a building from the cache or with the import function."""
+        if self._mapping_version is None:
+            self._mapping_version = get_mapping_version()
+        fingerprint = get_fingerprint(
+            building_energy, self.mode, mapping_version=self._mapping_version
+        )
+        path = self._get_path(building_energy.gmlid, fingerprint)
+
+        if os.path.isfile(path + ".meta.json"):
+            self.hits += 1
+            return self._load(path, project, buildings_not_generated)
+
+        self.misses += 1
+        number_of_buildings = len(project.buildings)
+        result = self.import_function(
+            building_energy=building_energy,
+            project=project,
+            buildings_not_generated=buildings_not_generated,
+        )
+        bldg = None
+        if len(project.buildings) > number_of_buildings:
+            bldg = project.buildings[-1]
+        self._save(path, building_energy.gmlid, bldg, result)
+        return result
+
+    def _save(self, path, gmlid, bldg, result):
+        """Store building and result of the import function."""
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        for old_path in glob.glob(self._get_path(gmlid, "?" * 40) + ".*"):
+            os.remove(old_path)
+
+        if bldg is not None:
+            tmp_project = teaser_data.new_project()
+            tmp_project.buildings = [bldg]
+            tmp_project.save_project(
+                file_name=os.path.basename(path), path=self.cache_dir
+            )
+
+        meta = {
+            "gmlid": gmlid,
+            "generated": bldg is not None,
+            "extra": result[1] if isinstance(result, tuple) else None,
+            "tuple": isinstance(result, tuple),
+        }
+        with open(path + ".meta.json", "w") as meta_file:
+            json.dump(meta, meta_file, default=_json_default)
+
+    def _load(self, path, project, buildings_not_generated):
+        """Load building and result of the import function."""
+        with open(path + ".meta.json") as meta_file:
+            meta = json.load(meta_file)
+
+        if meta["generated"]:
+            tmp_project = teaser_data.new_project()
+            tmp_project.load_project(path + ".json")
+            bldg = tmp_project.buildings[-1]
+            bldg.parent = project
+        else:
+            buildings_not_generated.append(meta["gmlid"])
+
+        if meta["tuple"]:
+            return buildings_not_generated, meta["extra"]
+        return buildings_not_generated
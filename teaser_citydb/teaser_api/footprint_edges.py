@@ -0,0 +1,197 @@
+"""Module to compute edges and orientations of building footprints.
+
+The geometry based importers split the footprint of a building into its
+edges and assign each edge an orientation. Orientations are snapped to the
+main directions by a bin table, see ORIENTATION_BINS. This module contains
+a scalar function for a single line and a vectorized NumPy path for the
+rings of one or many footprints. Both compute the angle of an edge with
+math.atan2, because np.arctan2 may differ by one ulp and round edges at
+half degree ties (e.g. -33.5) to the other side.
+"""
+import math
+import numpy as np
+
+# very Juelich specific
+# Each bin is (lower bound, upper bound, snapped orientation). An
+# orientation strictly between the bounds is snapped, the first matching bin
+# wins. Orientations in no bin are kept.
+ORIENTATION_BINS = [
+    (1.0, 10.0, 0.0),
+    (35.0, 55.0, 45.0),
+    (80.0, 110.0, 90.0),
+    (125.0, 145.0, 135.0),
+    (170.0, 179.0, 180.0),
+    (181.0, 190.0, 180.0),
+    (215.0, 235.0, 225.0),
+    (260.0, 280.0, 270.0),
+    (305.0, 325.0, 315.0),
+    (350.0, 369.0, 0.0),
+]
+
+
+def get_orientation(line, bins=ORIENTATION_BINS):
+    """Return the snapped orientation of a line with two points.
+
+    Parameters
+    ----------
+    line : LineString or sequence
+        Line with start point line[0] and end point line[1]
+    bins : list
+        Bin table with (lower, upper, snapped orientation) tuples
+        (default: ORIENTATION_BINS)
+
+    Returns
+    -------
+    orientation : float
+        Orientation of the line in degree
+
+    """
+    normal = round(
+        math.atan2((line[1][1] - line[0][1]), (line[1][0] - line[0][0]))
+        * (180 / math.pi),
+        0,
+    )
+
+    if normal == 0 or normal == 180:
+        return round(normal, 0)
+    elif normal < 0.0:
+        orientation = -normal
+    else:
+        orientation = 360.0 - normal
+
+    for lower, upper, snapped in bins:
+        if lower < orientation < upper:
+            return snapped
+    return orientation
+
+
+def snap_orientations(normals, bins=ORIENTATION_BINS):
+    """Return snapped orientations for an array of rounded normals.
+
+    Vectorized counterpart of get_orientation().
+
+    Parameters
+    ----------
+    normals : numpy.ndarray
+        Angles of the edges in degree, rounded to integers
+    bins : list
+        Bin table with (lower, upper, snapped orientation) tuples
+        (default: ORIENTATION_BINS)
+
+    Returns
+    -------
+    orientations : numpy.ndarray
+        Orientations of the edges in degree
+
+    """
+    normals = np.asarray(normals, dtype=float)
+    unsnapped = (normals == 0.0) | (normals == 180.0)
+    orientations = np.where(normals < 0.0, -normals, 360.0 - normals)
+    orientations = np.where(unsnapped, normals, orientations)
+    if not bins:
+        return orientations
+
+    conditions = [
+        ~unsnapped & (lower < orientations) & (orientations < upper)
+        for lower, upper, snapped in bins
+    ]
+    choices = [snapped for lower, upper, snapped in bins]
+    return np.select(conditions, choices, default=orientations)
+
+
+def get_ring_coordinates(footprint):
+    """Return the coordinates of all rings of a footprint as arrays.
+
+    Parameters
+    ----------
+    footprint : Polygon
+        GEOS Polygon of the building footprint
+
+    Returns
+    -------
+    rings : list
+        List of numpy.ndarray with shape (number of points, 2)
+
+    """
+    return [np.asarray(ring.coords, dtype=float)[:, :2] for ring in footprint]
+
+
+def get_footprint_edges(footprints, bins=ORIENTATION_BINS):
+    """Return lengths and orientations of all edges of many footprints.
+
+    Edges connect consecutive points of each ring, the same way as one
+    LineString per segment does. Only x and y coordinates are used.
+
+    Parameters
+    ----------
+    footprints : list
+        List of footprints, each footprint is a list of rings and each ring
+        an array-like with shape (number of points, 2 or 3), e.g. the result
+        of get_ring_coordinates().
+    bins : list
+        Bin table with (lower, upper, snapped orientation) tuples
+        (default: ORIENTATION_BINS)
+
+    Returns
+    -------
+    lengths : numpy.ndarray
+        Length of each edge
+    orientations : numpy.ndarray
+        Snapped orientation of each edge in degree
+    footprint_index : numpy.ndarray
+        Index of the footprint in footprints each edge belongs to
+
+    """
+    starts = []
+    ends = []
+    footprint_index = []
+    for i, rings in enumerate(footprints):
+        for ring in rings:
+            ring = np.asarray(ring, dtype=float)
+            if len(ring) < 2:
+                continue
+            starts.append(ring[:-1, :2])
+            ends.append(ring[1:, :2])
+            footprint_index.append(np.full(len(ring) - 1, i))
+
+    if not starts:
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=int)
+
+    delta = np.concatenate(ends) - np.concatenate(starts)
+    lengths = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+    angles = np.fromiter(
+        map(math.atan2, delta[:, 1].tolist(), delta[:, 0].tolist()),
+        dtype=float,
+        count=len(delta),
+    )
+    normals = np.round(angles * (180 / math.pi), 0)
+    return lengths, snap_orientations(normals, bins), np.concatenate(footprint_index)
+
+
+def get_facade(lengths, orientations, height):
+    """Return facade area per orientation.
+
+    Orientations are in the order of their first edge.
+
+    Parameters
+    ----------
+    lengths : numpy.ndarray or list
+        Length of each edge
+    orientations : numpy.ndarray or list
+        Orientation of each edge
+    height : float
+        Height of the building
+
+    Returns
+    -------
+    facade : dict
+        Facade area (edge length * height) summed per orientation
+
+    """
+    facade = {}
+    for length, orientation in zip(
+        np.asarray(lengths).tolist(), np.asarray(orientations).tolist()
+    ):
+        facade[orientation] = facade.get(orientation, 0.0) + length * height
+    return facade
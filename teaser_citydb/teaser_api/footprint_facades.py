@@ -0,0 +1,302 @@
+"""Module to aggregate footprint facades of buildings in PostGIS.
+
+The geometry, window and window usage zone importers need the footprint area
+and the facade length per orientation of each building. Instead of loading
+every footprint as GEOS object, the footprints are split into segments and
+aggregated per building and rounded orientation in the database with one SQL
+statement. Orientations are snapped in Python with the same bin table as
+footprint_edges.
+
+The results are stored in the table of BuildingFacade. Importers read the
+table with one indexed query per chunk, buildings that are not yet in the
+table are computed in memory. Imports never write to the table. It is filled
+explicitly with refresh_city_model_facades() after the geometries of
+buildings changed, by the command refresh_building_facades or at the end of
+from_teaser.import_city_model(refresh_facades=True).
+
+Note: This requires PostGIS 3.2 or newer (ST_DumpSegments).
+"""
+from collections import OrderedDict
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import F
+from citydb.models import EnergyBuilding
+from teaser_citydb.models import BuildingFacade
+import teaser_citydb.teaser_api.footprint_edges as footprint_edges
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+
+# The orientation is computed with atan2 of the segment end points (and not
+# with ST_Azimuth) to follow the same convention and rounding as
+# footprint_edges.get_orientation().
+FACADE_SQL = """
+WITH footprints AS ({footprints}),
+segments AS (
+    SELECT
+        f.building_id,
+        ST_Area(f.footprint) AS footprint_area,
+        d.path AS path,
+        d.geom AS segment
+    FROM footprints AS f, ST_DumpSegments(f.footprint) AS d
+)
+SELECT
+    building_id,
+    footprint_area,
+    ROUND(
+        ATAN2(
+            ST_Y(ST_EndPoint(segment)) - ST_Y(ST_StartPoint(segment)),
+            ST_X(ST_EndPoint(segment)) - ST_X(ST_StartPoint(segment))
+        ) * (180 / PI())
+    ) AS normal,
+    SUM(ST_Length(segment)) AS facade_length,
+    MIN(path) AS first_segment
+FROM segments
+GROUP BY building_id, footprint_area, normal
+ORDER BY building_id, first_segment
+"""
+
+
+def get_footprint_queryset(building_ids):
+    """Return a QuerySet with the footprint geometry of buildings.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects, can also be a values()
+        QuerySet, e.g. of all buildings of a city model.
+
+    Returns
+    -------
+    footprints : Django QuerySet
+        values() QuerySet with building_id and footprint
+
+    """
+    return (
+        EnergyBuilding.objects.filter(pk__in=building_ids)
+        .annotate(building_id=F("pk"), footprint=footprints.get_footprint_subquery())
+        .values("building_id", "footprint")
+    )
+
+
+def get_footprint_facades(
+    building_ids, bins=footprint_edges.ORIENTATION_BINS, using=None
+):
+    """Return footprint area and facade lengths per orientation of buildings.
+
+    All buildings are processed with one SQL statement. Buildings without
+    footprint are not part of the result.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects, can also be a values()
+        QuerySet, e.g. of all buildings of a city model:
+        get_city_buildings(city_model).values("building_obj__building_energy_obj")
+    bins : list
+        Bin table with (lower, upper, snapped orientation) tuples
+        (default: footprint_edges.ORIENTATION_BINS)
+    using : str
+        Database alias the statement is run on. If None, the alias of the
+        database router for reads of EnergyBuilding is used. (default: None)
+
+    Returns
+    -------
+    facades : dict
+        Dictionary with BuildingEnergy primary key as key and a dictionary
+        with 'footprint_area' and 'facade_length' (OrderedDict of snapped
+        orientation and summed edge length) as value.
+
+    """
+    if using is None:
+        using = router.db_for_read(EnergyBuilding) or DEFAULT_DB_ALIAS
+    footprints, params = (
+        get_footprint_queryset(building_ids).using(using).query.sql_with_params()
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(FACADE_SQL.format(footprints=footprints), params)
+        rows = cursor.fetchall()
+
+    orientations = footprint_edges.snap_orientations(
+        [row[2] for row in rows], bins
+    ).tolist()
+
+    facades = {}
+    for (building_id, footprint_area, normal, length, first), orientation in zip(
+        rows, orientations
+    ):
+        if building_id not in facades:
+            facades[building_id] = {
+                "footprint_area": footprint_area,
+                "facade_length": OrderedDict(),
+            }
+        facade_length = facades[building_id]["facade_length"]
+        facade_length[orientation] = facade_length.get(orientation, 0.0) + length
+    return facades
+
+
+def refresh_building_facades(building_ids):
+    """Recompute the stored facades of buildings.
+
+    Deletes the rows of the buildings in BuildingFacade and inserts the
+    result of get_footprint_facades(). The footprints are read from the
+    database the rows are written to.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    facades : dict
+        Result of get_footprint_facades()
+
+    """
+    building_ids = list(building_ids)
+    using = router.db_for_write(BuildingFacade) or DEFAULT_DB_ALIAS
+    facades = get_footprint_facades(building_ids, using=using)
+    rows = []
+    for building_id, footprint_facade in facades.items():
+        for position, (orientation, length) in enumerate(
+            footprint_facade["facade_length"].items()
+        ):
+            rows.append(
+                BuildingFacade(
+                    building_id=building_id,
+                    position=position,
+                    orientation=orientation,
+                    facade_length=length,
+                    footprint_area=footprint_facade["footprint_area"],
+                )
+            )
+    with transaction.atomic(using=using):
+        BuildingFacade.objects.using(using).filter(
+            building_id__in=building_ids
+        ).delete()
+        BuildingFacade.objects.using(using).bulk_create(rows)
+    return facades
+
+
+def refresh_city_model_facades(city_model=None, chunk_size=prefetch.CHUNK_SIZE):
+    """Recompute the stored facades of all buildings of a city model.
+
+    Buildings are refreshed in chunks, each chunk with one SQL statement
+    and one transaction.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        City model of the buildings. If None, all buildings are refreshed.
+        (default: None)
+    chunk_size : int
+        Number of buildings that are refreshed together (default: 200)
+
+    Returns
+    -------
+    number_of_buildings : int
+        Number of buildings with stored facades
+
+    """
+    if city_model is None:
+        building_ids = EnergyBuilding.objects.values_list("pk", flat=True)
+    else:
+        building_ids = prefetch.get_city_buildings(city_model).values_list(
+            "building_obj__building_energy_obj", flat=True
+        )
+    building_ids = [pk for pk in building_ids if pk is not None]
+
+    number_of_buildings = 0
+    for start in range(0, len(building_ids), chunk_size):
+        number_of_buildings += len(
+            refresh_building_facades(building_ids[start : start + chunk_size])
+        )
+    return number_of_buildings
+
+
+def load_building_facades(building_ids):
+    """Return the stored facades of buildings.
+
+    Buildings without stored facades are computed with
+    get_footprint_facades(), but not stored. Only reads from the database.
+
+    Parameters
+    ----------
+    building_ids : list
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    facades : dict
+        Same format as get_footprint_facades()
+
+    """
+    facades = {}
+    for building_id, orientation, length, footprint_area in (
+        BuildingFacade.objects.filter(building_id__in=building_ids)
+        .order_by("building_id", "position")
+        .values_list("building_id", "orientation", "facade_length", "footprint_area")
+    ):
+        if building_id not in facades:
+            facades[building_id] = {
+                "footprint_area": footprint_area,
+                "facade_length": OrderedDict(),
+            }
+        facades[building_id]["facade_length"][orientation] = length
+
+    missing = [pk for pk in building_ids if pk not in facades]
+    if missing:
+        facades.update(get_footprint_facades(missing))
+    return facades
+
+
+def annotate_footprint_facades(building_energies):
+    """Attach footprint area and facade lengths to BuildingEnergy objects.
+
+    Sets the attribute footprint_facade of each building, None if the
+    building has no footprint. Used as annotation in
+    prefetch_buildings.iter_building_chunks().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    facades = load_building_facades([bldg.pk for bldg in building_energies])
+    for bldg in building_energies:
+        bldg.footprint_facade = facades.get(bldg.pk)
+
+
+def get_building_facade(building_energy, height):
+    """Return footprint area and facade area per orientation of a building.
+
+    Uses the result of annotate_footprint_facades() if present, otherwise
+    the footprint is split in Python, see footprints.get_building_footprint().
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building the facade is computed for
+    height : float
+        Height of the building
+
+    Returns
+    -------
+    footprint_area : float
+        Area of the footprint
+    facade : dict
+        Facade area (edge length * height) per orientation
+
+    """
+    footprint_facade = getattr(building_energy, "footprint_facade", None)
+    if footprint_facade is not None:
+        facade = OrderedDict()
+        for orientation, length in footprint_facade["facade_length"].items():
+            facade[orientation] = length * height
+        return footprint_facade["footprint_area"], facade
+
+    rings, footprint_area, _ = footprints.get_building_footprint(building_energy)
+    lengths, orientations, _ = footprint_edges.get_footprint_edges([rings])
+    return footprint_area, footprint_edges.get_facade(lengths, orientations, height)
@@ -0,0 +1,261 @@
+"""Module to fetch building footprints in bulk as coordinate arrays.
+
+The importers used to load the footprint of each building with two queries
+and a GEOS object. The functions in this module fetch the footprints of a
+whole chunk of buildings with one query as WKB and parse them into NumPy
+coordinate arrays, which is all footprint_edges needs.
+"""
+import struct
+import numpy as np
+from django.contrib.gis.db.models import GeometryField
+from django.db.models import BinaryField
+from django.db.models import Func
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from citydb.models import EnergyBuilding
+
+WKB_POLYGON = 3
+WKB_MULTIPOLYGON = 6
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+
+def _related_lookup(model, field_name):
+    """Return related model and the lookup name pointing back to model."""
+    field = model._meta.get_field(field_name)
+    if field.auto_created and not field.concrete:
+        return field.related_model, field.field.name
+    return field.related_model, field.related_query_name()
+
+
+def get_footprint_subquery():
+    """Return a Subquery with the footprint geometry of a BuildingEnergy.
+
+    The footprint is the geometry of the first thematic surface, the same as
+    building_energy.bldg_thematic_surface.first().thematic_surface_geom
+    .first().geometry. The subquery refers to the primary key of the outer
+    BuildingEnergy query.
+
+    Returns
+    -------
+    footprint : Subquery
+        Subquery with a GeometryField as output field
+
+    """
+    surface_model, surface_lookup = _related_lookup(
+        EnergyBuilding, "bldg_thematic_surface"
+    )
+    geom_model, geom_lookup = _related_lookup(surface_model, "thematic_surface_geom")
+
+    first_surface = (
+        surface_model.objects.filter(**{surface_lookup: OuterRef(OuterRef("pk"))})
+        .order_by("pk")
+        .values("pk")[:1]
+    )
+    first_geometry = (
+        geom_model.objects.filter(**{geom_lookup: Subquery(first_surface)})
+        .order_by("pk")
+        .values("geometry")[:1]
+    )
+    return Subquery(first_geometry, output_field=GeometryField())
+
+
+def get_footprints_wkb(building_ids):
+    """Return the footprints of buildings as WKB with one query.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    footprints : dict
+        Dictionary with BuildingEnergy primary key as key and the footprint
+        as WKB (bytes) as value. Buildings without footprint are not part of
+        the result.
+
+    """
+    rows = (
+        EnergyBuilding.objects.filter(pk__in=building_ids)
+        .annotate(
+            footprint_wkb=Func(
+                get_footprint_subquery(),
+                function="ST_AsBinary",
+                output_field=BinaryField(),
+            )
+        )
+        .values_list("pk", "footprint_wkb")
+    )
+    return {pk: bytes(wkb) for pk, wkb in rows if wkb is not None}
+
+
+def _read_polygon(wkb, offset, byte_order, dimensions):
+    """Read the rings of a WKB polygon starting at offset."""
+    (number_of_rings,) = struct.unpack_from(byte_order + "I", wkb, offset)
+    offset += 4
+    rings = []
+    for i in range(number_of_rings):
+        (number_of_points,) = struct.unpack_from(byte_order + "I", wkb, offset)
+        offset += 4
+        ring = np.frombuffer(
+            wkb,
+            dtype=np.dtype(byte_order + "f8"),
+            count=number_of_points * dimensions,
+            offset=offset,
+        ).reshape(number_of_points, dimensions)
+        offset += number_of_points * dimensions * 8
+        rings.append(ring[:, :2])
+    return rings, offset
+
+
+def _read_header(wkb, offset):
+    """Read byte order, geometry type and number of dimensions.
+
+    Supports ISO WKB (type + 1000/2000/3000) and the extended WKB of GEOS
+    and PostGIS (Z, M and SRID flags in the high bits).
+    """
+    byte_order = "<" if wkb[offset] == 1 else ">"
+    (geometry_type,) = struct.unpack_from(byte_order + "I", wkb, offset + 1)
+    offset += 5
+    iso_dimensions = (geometry_type & 0x0FFFFFFF) // 1000
+    has_z = bool(geometry_type & EWKB_Z) or iso_dimensions in (1, 3)
+    has_m = bool(geometry_type & EWKB_M) or iso_dimensions in (2, 3)
+    if geometry_type & EWKB_SRID:
+        offset += 4
+    return byte_order, (geometry_type & 0x0FFFFFFF) % 1000, 2 + has_z + has_m, offset
+
+
+def parse_wkb(wkb):
+    """Return the polygons of a WKB (multi) polygon as coordinate arrays.
+
+    Parameters
+    ----------
+    wkb : bytes
+        ISO WKB of a Polygon or MultiPolygon, with or without Z and M values
+
+    Returns
+    -------
+    polygons : list
+        List of polygons, each polygon is a list of rings (exterior ring
+        first) and each ring a numpy.ndarray with shape (number of points, 2)
+
+    """
+    byte_order, geometry_type, dimensions, offset = _read_header(wkb, 0)
+    if geometry_type == WKB_POLYGON:
+        rings, offset = _read_polygon(wkb, offset, byte_order, dimensions)
+        return [rings]
+    if geometry_type == WKB_MULTIPOLYGON:
+        (number_of_polygons,) = struct.unpack_from(byte_order + "I", wkb, offset)
+        offset += 4
+        polygons = []
+        for i in range(number_of_polygons):
+            byte_order, _, dimensions, offset = _read_header(wkb, offset)
+            rings, offset = _read_polygon(wkb, offset, byte_order, dimensions)
+            polygons.append(rings)
+        return polygons
+    raise ValueError(
+        "Footprint is no (multi) polygon, WKB type {}".format(geometry_type)
+    )
+
+
+def _ring_area(ring):
+    """Return the area of a closed ring with the shoelace formula."""
+    x = ring[:, 0] - ring[0, 0]
+    y = ring[:, 1] - ring[0, 1]
+    return abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2.0
+
+
+def _ring_length(ring):
+    """Return the length of a ring."""
+    delta = np.diff(ring, axis=0)
+    return float(np.sqrt((delta * delta).sum(axis=1)).sum())
+
+
+def get_footprint_shape(polygons):
+    """Return rings, area and perimeter of a footprint.
+
+    Area and perimeter follow GEOS: holes are subtracted from the area and
+    their length is part of the perimeter.
+
+    Parameters
+    ----------
+    polygons : list
+        Result of parse_wkb()
+
+    Returns
+    -------
+    rings : list
+        All rings of all polygons as numpy.ndarray with shape
+        (number of points, 2), see footprint_edges.get_footprint_edges()
+    area : float
+        Area of the footprint
+    length : float
+        Perimeter of the footprint
+
+    """
+    rings = []
+    area = 0.0
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            area += _ring_area(ring) if i == 0 else -_ring_area(ring)
+            rings.append(ring)
+    length = sum(_ring_length(ring) for ring in rings)
+    return rings, float(area), length
+
+
+def annotate_footprints(building_energies):
+    """Attach the footprint shape to BuildingEnergy objects.
+
+    Sets the attribute footprint_shape (result of get_footprint_shape()) of
+    each building, None if the building has no footprint. Used as
+    annotation in prefetch_buildings.iter_building_chunks().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    footprints = get_footprints_wkb([bldg.pk for bldg in building_energies])
+    for bldg in building_energies:
+        wkb = footprints.get(bldg.pk)
+        if wkb is None:
+            bldg.footprint_shape = None
+        else:
+            bldg.footprint_shape = get_footprint_shape(parse_wkb(wkb))
+
+
+def get_building_footprint(building_energy):
+    """Return rings, area and perimeter of the footprint of a building.
+
+    Uses the result of annotate_footprints() if present, otherwise the
+    footprint is loaded as GEOS object.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building the footprint is returned for
+
+    Returns
+    -------
+    rings : list
+        All rings of the footprint as numpy.ndarray with shape
+        (number of points, 2)
+    area : float
+        Area of the footprint
+    length : float
+        Perimeter of the footprint
+
+    """
+    footprint_shape = getattr(building_energy, "footprint_shape", None)
+    if footprint_shape is not None:
+        return footprint_shape
+
+    footprint = (
+        building_energy.bldg_thematic_surface.first()
+        .thematic_surface_geom.first()
+        .geometry
+    )
+    return get_footprint_shape(parse_wkb(bytes(footprint.wkb)))
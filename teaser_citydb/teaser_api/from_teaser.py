@@ -25,6 +25,8 @@ from citydb.models import EnergyConversionSystem
 from citydb.models import SystemOperation
 from citydb.models import HeatExchangeType
 from datetime import datetime as dt
+import teaser_citydb.teaser_api.hourly_schedules as hourly_schedules
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
 
 BUILDING_FUNCTION = {
     "Office": "1300",
@@ -40,6 +42,7 @@ def import_city_model(
     description="Transfer a TEASER project to 3DCityDB.",
     updating_person="pre",
     reason_for_update="First entry of this project.",
+    refresh_facades=False,
 ):
     """Documentation is missing."""
     city_model = CityModel(
@@ -60,6 +63,10 @@ def import_city_model(
         )
         city_model.city_object_member.add(bldg_dj)
         city_model.save()
+    if refresh_facades:
+        # store the facades of the buildings for the geometry based importers,
+        # requires PostGIS 3.2 or newer
+        footprint_facades.refresh_city_model_facades(city_model=city_model)
     return city_model
 
 
@@ -335,12 +342,20 @@ def _import_schedule(
         schedule_values = IrregularTimeSeriesFile.objects.get(
             file_id="{}_{}".format(usage_name, objectclass_schedule)
         )
-        values = schedule_values.get_values(
-            start=dt(2014, 1, 1, 0, 0, 0), end=dt(2014, 1, 7, 23, 55, 0), mean="1h"
+        values = hourly_schedules.get_hourly_values(
+            schedule_values.file_id,
+            start=dt(2014, 1, 1, 0, 0, 0),
+            end=dt(2014, 1, 7, 23, 55, 0),
         )
-        values["test"] = time_depending_values.values
+        if values is None:
+            values = schedule_values.get_values(
+                start=dt(2014, 1, 1, 0, 0, 0),
+                end=dt(2014, 1, 7, 23, 55, 0),
+                mean="1h",
+            )
+            values = values.ix[:, 0].tolist()
 
-        if values.ix[:, 0].equals(values["test"]):
+        if values == time_depending_values.tolist():
             pass
         else:
 
@@ -366,6 +381,9 @@ def _import_schedule(
             )
             schedule_values.values = time_depending_values
             schedule_values.save()
+            hourly_schedules.store_hourly_schedule(
+                schedule_values.file_id, time_depending_values.iloc[:, 0]
+            )
     except IrregularTimeSeriesFile.DoesNotExist:
         schedule_values = IrregularTimeSeriesFile(
             objectclass=ObjectClass.objects.get(classname="IrregularTimeSeriesFile"),
@@ -387,6 +405,9 @@ def _import_schedule(
         )
         schedule_values.values = time_depending_values
         schedule_values.save()
+        hourly_schedules.store_hourly_schedule(
+            schedule_values.file_id, time_depending_values.iloc[:, 0]
+        )
 
     ts_schedule = TimeSeriesSchedule(
         objectclass=ObjectClass.objects.get(classname="TimeSeriesSchedule"),
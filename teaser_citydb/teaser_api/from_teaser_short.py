@@ -11,6 +11,7 @@ from citydb.models import HeatExchanger
 from citydb.models import EnergyConversionSystem
 from citydb.models import SystemOperation
 from citydb.models import ThermalZone
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
 
 BUILDING_FUNCTION = {
     "Office": "1300",
@@ -26,6 +27,7 @@ def import_city_model_short(
     description="Transfer a TEASER project to 3DCityDB.",
     updating_person="pre",
     reason_for_update="First entry of this project.",
+    refresh_facades=False,
 ):
     """Documentation is missing."""
     city_model = CityModel(
@@ -46,6 +48,10 @@ def import_city_model_short(
         )
         city_model.city_object_member.add(bldg_dj)
         city_model.save()
+    if refresh_facades:
+        # store the facades of the buildings for the geometry based importers,
+        # requires PostGIS 3.2 or newer
+        footprint_facades.refresh_city_model_facades(city_model=city_model)
     return city_model
 
 
@@ -0,0 +1,110 @@
+"""Module to store and read materialized hourly schedules.
+
+Schedules of usage zones are stored as IrregularTimeSeriesFile and had to be
+resampled to hourly means on every read. This module stores the hourly
+values once in HourlySchedule when a schedule is written (migration,
+from_teaser or backfill_hourly_schedules command) and reads them back with
+one indexed lookup.
+"""
+from datetime import datetime as dt
+from citydb.models import IrregularTimeSeriesFile
+from teaser_citydb.models import HourlySchedule
+
+SCHEDULE_START = dt(2014, 1, 1, 0, 0, 0)
+SCHEDULE_END = dt(2014, 12, 31, 23, 55, 0)
+
+
+def store_hourly_schedule(file_id, values, start=SCHEDULE_START):
+    """Store the hourly values of a schedule.
+
+    Parameters
+    ----------
+    file_id : str
+        file_id of the IrregularTimeSeriesFile of the schedule
+    values : pandas.Series, numpy.ndarray or list
+        Hourly values of the schedule
+    start : datetime
+        Time of the first value (default: 2014-01-01 00:00)
+
+    Returns
+    -------
+    hourly_schedule : HourlySchedule instance
+        Stored hourly schedule
+
+    """
+    hourly_schedule, _ = HourlySchedule.objects.update_or_create(
+        file_id=file_id,
+        defaults={"start": start, "values": [float(value) for value in values]},
+    )
+    return hourly_schedule
+
+
+def get_hourly_values(file_id, start=SCHEDULE_START, end=SCHEDULE_END):
+    """Return stored hourly values of a schedule between start and end.
+
+    Parameters
+    ----------
+    file_id : str
+        file_id of the IrregularTimeSeriesFile of the schedule
+    start : datetime
+        Start of the requested period (default: 2014-01-01 00:00)
+    end : datetime
+        End of the requested period, the hour of end is included
+        (default: 2014-12-31 23:55)
+
+    Returns
+    -------
+    values : list
+        Hourly values, None if the schedule is not materialized or starts
+        after start.
+
+    """
+    try:
+        hourly_schedule = HourlySchedule.objects.only("start", "values").get(
+            file_id=file_id
+        )
+    except HourlySchedule.DoesNotExist:
+        return None
+
+    first = int((start - hourly_schedule.start).total_seconds() // 3600)
+    if first < 0:
+        return None
+    last = int((end - hourly_schedule.start).total_seconds() // 3600) + 1
+    return hourly_schedule.values[first:last]
+
+
+def backfill_hourly_schedules(file_ids=None, overwrite=False):
+    """Materialize hourly values of existing schedule time series.
+
+    Parameters
+    ----------
+    file_ids : list
+        file_ids of the time series that are materialized. If None, all
+        IrregularTimeSeriesFile objects with thematic description 'Schedule'
+        are used. (default: None)
+    overwrite : bool
+        If False, schedules that are already materialized are skipped
+        (default: False)
+
+    Returns
+    -------
+    stored : list
+        file_ids of all stored schedules
+
+    """
+    series_files = IrregularTimeSeriesFile.objects.filter(
+        thematic_description="Schedule"
+    )
+    if file_ids is not None:
+        series_files = series_files.filter(file_id__in=file_ids)
+    if not overwrite:
+        series_files = series_files.exclude(
+            file_id__in=HourlySchedule.objects.values("file_id")
+        )
+
+    stored = []
+    for series in series_files.iterator():
+        series.get_values(start=SCHEDULE_START, end=SCHEDULE_END, mean="1h", query=None)
+        store_hourly_schedule(series.file_id, series.values.iloc[:, 0])
+        stored.append(series.file_id)
+    return stored
@@ -0,0 +1,692 @@
+"""Module to control (multiprocessing) import of buildings into TEASER."""
+import collections
+import importlib
+import multiprocessing
+import traceback
+import numpy as np
+from django import db
+import teaser_citydb.routers as routers
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.window_areas as window_area_sums
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+import teaser_citydb.teaser_api.building_cache as building_cache
+import teaser_citydb.teaser_api.prevalidation as prevalidation
+import teaser_citydb.teaser_api.boundary_table as boundary_table
+from teaser_citydb.teaser_api.archetype_cache import archetype_cache
+from teaser_citydb.teaser_api.layer_cache import layer_cache
+
+IMPORT_MODES = {
+    "archetype": {
+        "module": "teaser_citydb.teaser_api.to_teaser",
+        "function": "_import_building_archetype",
+        "lookups": None,
+        "annotations": [],
+    },
+    "geometry": {
+        "module": "teaser_citydb.teaser_api.to_teaser_geometry",
+        "function": "_import_building_geometry",
+        "lookups": None,
+        "annotations": [footprint_facades.annotate_footprint_facades],
+    },
+    "element": {
+        "module": "teaser_citydb.teaser_api.to_teaser_bldg_element",
+        "function": "_import_building_element",
+        "lookups": "ELEMENT_LOOKUPS",
+        "annotations": [
+            footprints.annotate_footprints,
+            boundary_table.annotate_boundary_tables,
+        ],
+    },
+    "errors": {
+        "module": "teaser_citydb.teaser_api.to_teaser_errors",
+        "function": "_import_building_element",
+        "lookups": "ELEMENT_LOOKUPS",
+        "annotations": prevalidation.DISPATCH_ANNOTATIONS
+        + [boundary_table.annotate_boundary_tables],
+    },
+    "window": {
+        "module": "teaser_citydb.teaser_api.to_teaser_window",
+        "function": "_import_building_window",
+        "lookups": "WINDOW_LOOKUPS",
+        "annotations": [
+            footprint_facades.annotate_footprint_facades,
+            window_area_sums.annotate_window_areas,
+        ],
+    },
+    "usage_zone": {
+        "module": "teaser_citydb.teaser_api.to_teaser_usage_zone",
+        "function": "_import_building_usage_zone",
+        "lookups": "USAGE_ZONE_LOOKUPS",
+        "annotations": [footprint_facades.annotate_footprint_facades],
+    },
+    "window_usage_zone": {
+        "module": "teaser_citydb.teaser_api.to_teaser_window_usage_zone",
+        "function": "_import_building_window_usage_zone",
+        "lookups": "WINDOW_USAGE_ZONE_LOOKUPS",
+        "annotations": [
+            footprint_facades.annotate_footprint_facades,
+            window_area_sums.annotate_window_areas,
+        ],
+    },
+}
+
+
+# Caches used by the import functions. Workers send their hits and misses
+# back to the parent, which adds them to its own counters.
+WORKER_CACHES = [archetype_cache, layer_cache]
+
+
+def _get_worker_caches(import_function):
+    """Return WORKER_CACHES and the building cache of the import function."""
+    if isinstance(import_function, building_cache.CachedImport):
+        return WORKER_CACHES + [import_function]
+    return WORKER_CACHES
+
+
+class WorkerImport(multiprocessing.Process):
+    """Helper class to enable import of buildings in a Queue.
+
+    This class inherits from multiprocessing.Proccess. Pass over your
+    building import function and all parameters that are necessary for this
+    function.
+
+    Parameters
+    ----------
+    import_function : _import_building_* function
+        Function of one of the to_teaser_* modules that imports a single
+        building into a TEASER project.
+    import_part : NumPy Array, list or any other iterable
+        Iterable collection of CityObjects of class Building
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding
+    chunk_size : int
+        Number of buildings that are prefetched together
+    annotations : list
+        Functions that attach bulk loaded data to each chunk
+    process_number : int
+        Counter of parallel processes.
+    result_queue : multiprocessing.Queue()
+        Queue the results of all workers are put in, together with the hits
+        and misses of WORKER_CACHES (and of the building cache, see
+        building_cache.CachedImport). A failing worker puts the traceback of
+        the error instead of its results.
+    """
+
+    def __init__(
+        self,
+        import_function,
+        import_part,
+        lookups,
+        chunk_size,
+        annotations,
+        process_number,
+        result_queue,
+    ):
+        """Init function of WorkerImport."""
+        multiprocessing.Process.__init__(self)
+
+        self.import_function = import_function
+        self.import_part = import_part
+        self.lookups = lookups
+        self.chunk_size = chunk_size
+        self.annotations = annotations
+        self.process_number = process_number
+        self.result_queue = result_queue
+
+    def run(self):
+        """Run the import function for all buildings of this worker."""
+        # counters are inherited from the parent, only the new ones are sent
+        caches = _get_worker_caches(self.import_function)
+        start_stats = [(cache.hits, cache.misses) for cache in caches]
+        try:
+            res_tmp = import_building_part(
+                import_function=self.import_function,
+                import_part=self.import_part,
+                lookups=self.lookups,
+                chunk_size=self.chunk_size,
+                annotations=self.annotations,
+            )
+        except Exception:
+            # The parent waits for one result per worker, thus the error is
+            # put on the queue before the worker exits.
+            self.result_queue.put((self.process_number, traceback.format_exc()))
+            raise
+        cache_stats = [
+            (cache.hits - hits, cache.misses - misses)
+            for cache, (hits, misses) in zip(caches, start_stats)
+        ]
+        self.result_queue.put((self.process_number, None, cache_stats) + res_tmp)
+
+
+def get_import_mode(mode):
+    """Return import function and prefetch lookups of an import mode.
+
+    The to_teaser_* modules are imported on first use only.
+
+    Parameters
+    ----------
+    mode : str
+        Name of the import mode, one of IMPORT_MODES.keys()
+
+    Returns
+    -------
+    import_function : _import_building_* function
+        Function that imports a single building into a TEASER project.
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding, None if no related
+        objects are needed.
+    annotations : list
+        Functions that attach bulk loaded data to each chunk of buildings
+
+    """
+    try:
+        import_mode = IMPORT_MODES[mode]
+    except KeyError:
+        raise ValueError(
+            "Unknown import mode {}, use one of {}".format(
+                mode, list(IMPORT_MODES.keys())
+            )
+        )
+    module = importlib.import_module(import_mode["module"])
+    if import_mode["lookups"] is None:
+        lookups = None
+    else:
+        lookups = getattr(prefetch, import_mode["lookups"])
+    return (
+        getattr(module, import_mode["function"]),
+        lookups,
+        import_mode["annotations"],
+    )
+
+
+def _select_buildings(city_model, buildings, bbox, polygon, chunk_size):
+    """Return buildings of a spatial selection if no buildings are given."""
+    if buildings is not None or (bbox is None and polygon is None):
+        return buildings
+    return prefetch.get_city_buildings(
+        city_model=city_model, bbox=bbox, polygon=polygon
+    ).iterator(chunk_size=chunk_size)
+
+
+@routers.read_from_replica()
+def import_buildings(
+    import_function,
+    project,
+    city_model,
+    buildings=None,
+    lookups=None,
+    workers=None,
+    chunk_size=prefetch.CHUNK_SIZE,
+    annotations=None,
+    bbox=None,
+    polygon=None,
+    cache_dir=None,
+):
+    """Import buildings into a TEASER project.
+
+    Buildings are imported in serial (one after another) in chunks with
+    prefetched object graph. If more than one worker is given, the import is
+    split across a pool of processes, see queue_import().
+
+    Parameters
+    ----------
+    import_function : _import_building_* function
+        Function of one of the to_teaser_* modules that imports a single
+        building into a TEASER project. It returns buildings_not_generated
+        or a tuple of buildings_not_generated and an additional result.
+    project : teaser.Project()
+        Project instance of TEASER the buildings are added to.
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are used. (default: None)
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding (default: None)
+    workers : int
+        Number of worker processes used for the import. None or 1 imports in
+        the current process. (default: None)
+    chunk_size : int
+        Number of buildings that are fetched and prefetched together
+        (default: 200)
+    annotations : list
+        Functions that attach bulk loaded data to each chunk of buildings,
+        see prefetch_buildings.iter_building_chunks() (default: None)
+    bbox : tuple
+        Select buildings in a bounding box (xmin, ymin, xmax, ymax), only
+        used if buildings is None (default: None)
+    polygon : GEOSGeometry
+        Select buildings in a polygon, only used if buildings is None
+        (default: None)
+    cache_dir : str
+        Directory of the on-disk cache of generated buildings, see
+        building_cache.CachedImport. None disables the cache. (default: None)
+
+    Returns
+    -------
+    buildings_not_generated : list
+        List of gmlids of buildings that could not be generated.
+    results : list
+        Additional results of the import function for each building, empty if
+        the import function returns only buildings_not_generated.
+
+    """
+    buildings = _select_buildings(city_model, buildings, bbox, polygon, chunk_size)
+    if cache_dir is not None:
+        import_function = building_cache.CachedImport(import_function, cache_dir)
+    if workers is not None and workers > 1:
+        buildings_not_generated, results = queue_import(
+            import_function=import_function,
+            project=project,
+            city_model=city_model,
+            buildings=buildings,
+            lookups=lookups,
+            number_of_workers=workers,
+            chunk_size=chunk_size,
+            annotations=annotations,
+        )
+        if cache_dir is not None:
+            _print_building_cache(import_function)
+        return buildings_not_generated, results
+    if lookups is None:
+        lookups = []
+    buildings_not_generated = []
+    results = []
+
+    for chunk in prefetch.iter_building_chunks(
+        city_model=city_model,
+        buildings=buildings,
+        lookups=lookups,
+        chunk_size=chunk_size,
+        annotations=annotations,
+    ):
+        for building_energy in chunk:
+            result = import_function(
+                building_energy=building_energy,
+                project=project,
+                buildings_not_generated=buildings_not_generated,
+            )
+            if isinstance(result, tuple):
+                buildings_not_generated, extra = result
+                results.append(extra)
+            else:
+                buildings_not_generated = result
+
+    if cache_dir is not None:
+        _print_building_cache(import_function)
+    return buildings_not_generated, results
+
+
+def _print_building_cache(cached_import):
+    """Print hits and misses of the building cache."""
+    print(
+        "Building cache: {} hits, {} misses".format(
+            cached_import.hits, cached_import.misses
+        )
+    )
+
+
+@routers.read_from_replica()
+def import_building_part(
+    import_function, import_part, lookups, chunk_size, annotations
+):
+    """Import a part of the buildings in a separate TEASER project.
+
+    This function is used by WorkerImport(). It opens its own database
+    connections and detaches the generated buildings from its project, so
+    they can be sent back to the parent process without the TEASER data.
+
+    Parameters
+    ----------
+    import_function : _import_building_* function
+        Function of one of the to_teaser_* modules that imports a single
+        building into a TEASER project.
+    import_part : NumPy Array, list or any other iterable
+        Iterable collection of CityObjects of class Building
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding
+    chunk_size : int
+        Number of buildings that are prefetched together
+    annotations : list
+        Functions that attach bulk loaded data to each chunk of buildings
+
+    Returns
+    -------
+    buildings : list
+        List of generated TEASER buildings without parent project
+    buildings_not_generated : list
+        List of gmlids of buildings that could not be generated.
+    results : list
+        Additional results of the import function for each building.
+
+    """
+    db.connections.close_all()
+
+    prj = teaser_data.new_project()
+    buildings_not_generated, results = import_buildings(
+        import_function=import_function,
+        project=prj,
+        city_model=None,
+        buildings=import_part,
+        lookups=lookups,
+        chunk_size=chunk_size,
+        annotations=annotations,
+    )
+    buildings = list(prj.buildings)
+    for bldg in buildings:
+        bldg.parent = None
+
+    db.connections.close_all()
+    return buildings, buildings_not_generated, results
+
+
+def queue_import(
+    import_function,
+    project,
+    city_model,
+    buildings=None,
+    lookups=None,
+    number_of_workers=multiprocessing.cpu_count() - 1,
+    chunk_size=prefetch.CHUNK_SIZE,
+    annotations=None,
+):
+    """Import buildings in parallel into a TEASER project.
+
+    Splits the buildings into one part per worker. Each worker imports its
+    part into its own TEASER project. Afterwards all generated buildings are
+    merged into the given project in the order of the parts. The hits and
+    misses of WORKER_CACHES (and of the building cache) in the workers are
+    added to the caches of the current process.
+
+    Parameters
+    ----------
+    import_function : _import_building_* function
+        Function of one of the to_teaser_* modules that imports a single
+        building into a TEASER project.
+    project : teaser.Project()
+        Project instance of TEASER the buildings are added to.
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are used. (default: None)
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding (default: None)
+    number_of_workers : int
+        Number of workers used for the import. (default: number of
+        physical processors - 1)
+    chunk_size : int
+        Number of buildings that are prefetched together (default: 200)
+    annotations : list
+        Functions that attach bulk loaded data to each chunk of buildings
+        (default: None)
+
+    Returns
+    -------
+    buildings_not_generated : list
+        List of gmlids of buildings that could not be generated.
+    results : list
+        Additional results of the import function for each building.
+
+    Raises
+    ------
+    RuntimeError
+        If one of the workers failed, with the traceback of the worker.
+
+    """
+    if buildings is None:
+        buildings = prefetch.get_city_buildings(city_model=city_model)
+    buildings = list(buildings)
+    db.connections.close_all()
+    # Load TEASER data before forking, workers inherit it copy-on-write.
+    teaser_data.get_data()
+
+    import_parts = np.array_split(np.array(buildings, dtype=object), number_of_workers)
+    result_queue = multiprocessing.Queue()
+
+    workers = []
+    for i, part in enumerate(import_parts):
+        workers.append(
+            WorkerImport(
+                import_function=import_function,
+                import_part=list(part),
+                lookups=lookups,
+                chunk_size=chunk_size,
+                annotations=annotations,
+                process_number=i,
+                result_queue=result_queue,
+            )
+        )
+
+    for w in workers:
+        w.start()  # Start worker
+
+    # Results must be taken from the queue before joining, otherwise workers
+    # with large results block on the full queue.
+    worker_results = sorted(
+        [result_queue.get() for w in workers], key=lambda res: res[0]
+    )
+
+    for w in workers:
+        w.join()  # Block worker
+
+    for res in worker_results:
+        if res[1] is not None:
+            raise RuntimeError("Import worker {} failed:\n{}".format(res[0], res[1]))
+
+    buildings_not_generated = []
+    results = []
+    for (
+        process_number,
+        error,
+        cache_stats,
+        part_buildings,
+        part_not_generated,
+        part_results,
+    ) in worker_results:
+        for cache, (hits, misses) in zip(
+            _get_worker_caches(import_function), cache_stats
+        ):
+            cache.hits += hits
+            cache.misses += misses
+        for bldg in part_buildings:
+            bldg.parent = project
+        buildings_not_generated.extend(part_not_generated)
+        results.extend(part_results)
+
+    return buildings_not_generated, results
+
+
+def iter_teaser_buildings(
+    city_model,
+    mode,
+    buildings=None,
+    project=None,
+    chunk_size=prefetch.CHUNK_SIZE,
+    bbox=None,
+    polygon=None,
+):
+    """Import buildings one by one and yield the TEASER buildings.
+
+    Generator variant of the to_teaser_* functions for very large city
+    models. Buildings are streamed from the database with a server-side
+    cursor and prefetched in chunks. Each generated building is removed from
+    project.buildings before it is yielded (it keeps project as parent for
+    export), thus memory does not grow with the number of buildings as long
+    as the caller does not keep them. Buildings already in project are kept.
+    The archetype and layer caches are cleared at the start and after each
+    chunk.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    mode : str
+        Name of the import mode, one of IMPORT_MODES.keys(), e.g. 'geometry'
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are used. (default: None)
+    project : teaser.Project()
+        Project instance of TEASER used as parent of the buildings. If None a
+        new Project with the name of the city model is created.
+        (default: None)
+    chunk_size : int
+        Number of buildings that are fetched and prefetched together
+        (default: 200)
+    bbox : tuple
+        Select buildings in a bounding box (xmin, ymin, xmax, ymax), only
+        used if buildings is None (default: None)
+    polygon : GEOSGeometry
+        Select buildings in a polygon, only used if buildings is None
+        (default: None)
+
+    Yields
+    ------
+    gmlid : str
+        gmlid of the building
+    result : teaser.Building() or str
+        Generated TEASER building or the reason why the building could not
+        be generated.
+
+    """
+    import_function, lookups, annotations = get_import_mode(mode)
+    if lookups is None:
+        lookups = []
+    buildings = _select_buildings(city_model, buildings, bbox, polygon, chunk_size)
+    if project is None:
+        project = teaser_data.new_project(name=city_model.name)
+    archetype_cache.clear()
+    layer_cache.clear()
+
+    for chunk in prefetch.iter_building_chunks(
+        city_model=city_model,
+        buildings=buildings,
+        lookups=lookups,
+        chunk_size=chunk_size,
+        annotations=annotations,
+    ):
+        for building_energy in chunk:
+            number_of_buildings = len(project.buildings)
+            try:
+                with routers.read_from_replica():
+                    import_function(
+                        building_energy=building_energy,
+                        project=project,
+                        buildings_not_generated=[],
+                    )
+            except Exception as e:
+                del project.buildings[number_of_buildings:]
+                yield building_energy.gmlid, "Import failed: {}".format(repr(e))
+                continue
+
+            new_buildings = project.buildings[number_of_buildings:]
+            del project.buildings[number_of_buildings:]
+            if len(new_buildings) == 0:
+                yield building_energy.gmlid, "No archetype or storeys defined"
+                continue
+            yield building_energy.gmlid, new_buildings[-1]
+        # the caches would otherwise grow with the number of buildings
+        archetype_cache.clear()
+        layer_cache.clear()
+
+
+def _merge_lookups(lookup_lists):
+    """Return the union of several lists of prefetch lookups.
+
+    Lookups are identified by their prefetch path, the first occurrence is
+    kept. Django does not allow the same lookup twice in one prefetch.
+    """
+    merged = collections.OrderedDict()
+    for lookups in lookup_lists:
+        for lookup in lookups or []:
+            merged.setdefault(getattr(lookup, "prefetch_to", lookup), lookup)
+    return list(merged.values())
+
+
+@routers.read_from_replica()
+def import_variants(
+    city_model,
+    modes,
+    buildings=None,
+    chunk_size=prefetch.CHUNK_SIZE,
+    bbox=None,
+    polygon=None,
+):
+    """Import buildings in several import modes with one pass over the data.
+
+    Each chunk of buildings is fetched, prefetched and annotated once with
+    the union of the lookups and annotations of all modes. Every building is
+    then imported by each mode into a separate TEASER project, e.g. for
+    calibration studies that compare enrichment levels.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    modes : list
+        Names of the import modes, see IMPORT_MODES.keys(), e.g.
+        ['archetype', 'geometry', 'window', 'element', 'usage_zone']
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are used. (default: None)
+    chunk_size : int
+        Number of buildings that are fetched and prefetched together
+        (default: 200)
+    bbox : tuple
+        Select buildings in a bounding box (xmin, ymin, xmax, ymax), only
+        used if buildings is None (default: None)
+    polygon : GEOSGeometry
+        Select buildings in a polygon, only used if buildings is None
+        (default: None)
+
+    Returns
+    -------
+    variants : OrderedDict
+        Import mode as key and a tuple of the TEASER project,
+        buildings_not_generated and the additional results of the import
+        function as value.
+
+    """
+    import_modes = collections.OrderedDict(
+        (mode, get_import_mode(mode)) for mode in modes
+    )
+    lookups = _merge_lookups(lookups for _, lookups, _ in import_modes.values())
+    annotations = []
+    for _, _, mode_annotations in import_modes.values():
+        for annotate in mode_annotations:
+            if annotate not in annotations:
+                annotations.append(annotate)
+
+    buildings = _select_buildings(city_model, buildings, bbox, polygon, chunk_size)
+    variants = collections.OrderedDict()
+    for mode in import_modes:
+        prj = teaser_data.new_project(name=city_model.name)
+        variants[mode] = (prj, [], [])
+    archetype_cache.clear()
+    layer_cache.clear()
+
+    for chunk in prefetch.iter_building_chunks(
+        city_model=city_model,
+        buildings=buildings,
+        lookups=lookups,
+        chunk_size=chunk_size,
+        annotations=annotations,
+    ):
+        for building_energy in chunk:
+            for mode, (import_function, _, _) in import_modes.items():
+                prj, buildings_not_generated, results = variants[mode]
+                result = import_function(
+                    building_energy=building_energy,
+                    project=prj,
+                    buildings_not_generated=buildings_not_generated,
+                )
+                if isinstance(result, tuple):
+                    buildings_not_generated, extra = result
+                    results.append(extra)
+                else:
+                    buildings_not_generated = result
+                variants[mode] = (prj, buildings_not_generated, results)
+
+    return variants
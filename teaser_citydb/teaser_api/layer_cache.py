@@ -0,0 +1,114 @@
+"""Module to memoize the layer description of constructions.
+
+The element importers describe the layers of the construction of every
+thermal boundary (position, thickness and material properties). Many
+boundaries share the same construction, thus the description is built once
+per construction and reused for all further boundaries of the import.
+"""
+import collections
+from collections import namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "currsize"])
+
+
+def get_layer_description(construction):
+    """Return the layer description of a construction.
+
+    Parameters
+    ----------
+    construction : Construction instance
+        Construction with (prefetched) layers and layer components
+
+    Returns
+    -------
+    layers : collections.OrderedDict
+        Dictionary with the index of the layer as key and a dictionary of
+        position, thickness, material, density, thermal_conduc and
+        heat_capac as value. None if the construction has no layers.
+
+    """
+    if hasattr(construction, "layer_description"):
+        # constructions of snapshots carry their description, see snapshot
+        return construction.layer_description
+
+    layers = construction.layer.all()
+    if len(layers) == 0:
+        return None
+    description = collections.OrderedDict()
+    for l, layer in enumerate(layers):
+        info_layer = layer.layer_component.first()
+        material = info_layer.material.solid_material_abstract
+        description[l] = collections.OrderedDict(
+            {
+                "position": int(layer.ordered_position),
+                "thickness": float(info_layer.thickness),
+                "material": material.name,
+                "density": float(material.density),
+                "thermal_conduc": float(material.conductivity),
+                "heat_capac": float(material.specific_heat / 1000),
+            }
+        )
+    return description
+
+
+class LayerCache(object):
+    """Cache of layer descriptions per construction.
+
+    Attributes
+    ----------
+    hits : int
+        Number of descriptions taken from the cache
+    misses : int
+        Number of descriptions built from the construction
+
+    """
+
+    def __init__(self):
+        """Init function of LayerCache."""
+        self.hits = 0
+        self.misses = 0
+        self._layers = {}
+
+    def get_layers(self, construction):
+        """Return the layer description of a construction.
+
+        Each call returns a new dictionary, thus the result can be changed
+        by the caller without changing the cache.
+
+        Parameters
+        ----------
+        construction : Construction instance
+            Construction with (prefetched) layers and layer components
+
+        Returns
+        -------
+        layers : collections.OrderedDict
+            See get_layer_description(), None if the construction has no
+            layers
+
+        """
+        if construction.pk in self._layers:
+            self.hits += 1
+            layers = self._layers[construction.pk]
+        else:
+            self.misses += 1
+            layers = get_layer_description(construction)
+            self._layers[construction.pk] = layers
+        if layers is None:
+            return None
+        return collections.OrderedDict(
+            (l, collections.OrderedDict(layer)) for l, layer in layers.items()
+        )
+
+    def cache_info(self):
+        """Return hits, misses and number of cached constructions."""
+        return CacheInfo(self.hits, self.misses, len(self._layers))
+
+    def clear(self):
+        """Drop all descriptions and reset the counters."""
+        self._layers.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+layer_cache = LayerCache()
@@ -0,0 +1,335 @@
+"""Module to load the object graph of buildings in chunks for TEASER imports.
+
+The importers walk building -> thermal zone -> thermal boundary ->
+construction -> layer -> layer component -> material (and the openings of
+each boundary). Without prefetching every step is a separate database round
+trip. The functions in this module fetch the whole graph for a chunk of
+buildings with a fixed number of queries, independent of the number of
+boundaries or layers per building.
+
+Note: Related managers only answer from the prefetch cache for .all() and
+.first(). Calling .filter() or .order_by() on them issues a new query, thus
+importers should filter prefetched relations in Python.
+"""
+import itertools
+import numpy as np
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.geos import Polygon
+from django.db.models import Prefetch
+from django.db.models import prefetch_related_objects
+from citydb.models import EnergyBuilding
+from citydb.models import ObjectClass
+import teaser_citydb.routers as routers
+
+CHUNK_SIZE = 200
+
+GEOMETRY_LOOKUP = (
+    "building_obj__building_energy_obj__bldg_thematic_surface__"
+    "thematic_surface_geom__geometry"
+)
+
+
+def _ordered_prefetch(lookup, ordering, select_related=None):
+    """Return a Prefetch object with a deterministically ordered queryset.
+
+    An ordered queryset is needed, otherwise .first() on the related manager
+    would clone the queryset and bypass the prefetch cache.
+
+    Parameters
+    ----------
+    lookup : str
+        Prefetch lookup starting at EnergyBuilding
+    ordering : str
+        Field name used to order the related objects
+    select_related : list
+        Optional list of relations that are joined into the prefetch query
+
+    """
+    model = EnergyBuilding
+    for field_name in lookup.split("__"):
+        model = model._meta.get_field(field_name).related_model
+    queryset = model.objects.order_by(ordering)
+    if select_related is not None:
+        queryset = queryset.select_related(*select_related)
+    return Prefetch(lookup, queryset=queryset)
+
+
+FOOTPRINT_LOOKUPS = [
+    _ordered_prefetch("bldg_thematic_surface", "pk"),
+    _ordered_prefetch("bldg_thematic_surface__thematic_surface_geom", "pk"),
+]
+
+ZONE_LOOKUPS = [_ordered_prefetch("thermal_zones", "pk")]
+
+_USAGE_ZONE = _ordered_prefetch("thermal_zones__usage_zone", "pk")
+
+_BOUNDARY_LOOKUPS = [
+    _ordered_prefetch(
+        "thermal_zones__thermal_boundary_obj", "pk", select_related=["construction"]
+    ),
+]
+
+_OPENING_LOOKUPS = [
+    _ordered_prefetch(
+        "thermal_zones__thermal_boundary_obj__contains",
+        "pk",
+        select_related=["construction"],
+    ),
+]
+
+USAGE_ZONE_LOOKUPS = ZONE_LOOKUPS + [_USAGE_ZONE]
+
+WINDOW_LOOKUPS = ZONE_LOOKUPS
+
+WINDOW_USAGE_ZONE_LOOKUPS = WINDOW_LOOKUPS + [_USAGE_ZONE]
+
+ELEMENT_LOOKUPS = (
+    ZONE_LOOKUPS
+    + _BOUNDARY_LOOKUPS
+    + [
+        _ordered_prefetch(
+            "thermal_zones__thermal_boundary_obj__construction__layer",
+            "ordered_position",
+        ),
+        _ordered_prefetch(
+            "thermal_zones__thermal_boundary_obj__construction__layer__layer_component",
+            "pk",
+            select_related=["material__solid_material_abstract"],
+        ),
+    ]
+)
+
+
+# Snapshots store the inputs of all importers except the full import.
+SNAPSHOT_LOOKUPS = ELEMENT_LOOKUPS + [_USAGE_ZONE]
+
+# The element importers take areas and u-values of boundaries and openings
+# from boundary_table, the full import of to_teaser() also needs the openings
+# with their layers and the usage zones.
+FULL_LOOKUPS = (
+    ELEMENT_LOOKUPS
+    + _OPENING_LOOKUPS
+    + [
+        _ordered_prefetch(
+            "thermal_zones__thermal_boundary_obj__contains__construction__layer",
+            "ordered_position",
+        ),
+        _ordered_prefetch(
+            "thermal_zones__thermal_boundary_obj__contains__construction__layer__"
+            "layer_component",
+            "pk",
+            select_related=["material__solid_material_abstract"],
+        ),
+    ]
+    + [_USAGE_ZONE]
+)
+
+
+def get_region(bbox=None, polygon=None):
+    """Return the region of a spatial selection as GEOS Polygon.
+
+    Parameters
+    ----------
+    bbox : tuple
+        Bounding box (xmin, ymin, xmax, ymax) in the coordinate system of
+        the city model (default: None)
+    polygon : GEOSGeometry
+        Polygon of the region, e.g. a district. If both are given, the
+        intersection is used. (default: None)
+
+    Returns
+    -------
+    region : GEOSGeometry
+        Region or None if neither bbox nor polygon is given
+
+    """
+    region = polygon
+    if bbox is not None:
+        bbox_polygon = Polygon.from_bbox(bbox)
+        if polygon is not None:
+            bbox_polygon.srid = polygon.srid
+            region = polygon.intersection(bbox_polygon)
+        else:
+            region = bbox_polygon
+    return region
+
+
+def get_city_buildings(city_model, bbox=None, polygon=None):
+    """Return a QuerySet of all buildings of a city model.
+
+    Buildings can be selected spatially by a bounding box or a polygon. The
+    selection intersects the thematic surface geometries of the buildings
+    and uses the spatial index of the geometry column.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    bbox : tuple
+        Bounding box (xmin, ymin, xmax, ymax) in the coordinate system of
+        the city model (default: None)
+    polygon : GEOSGeometry
+        Polygon of the region, e.g. a district (default: None)
+
+    Returns
+    -------
+    buildings : Django QuerySet
+        CityObjects of class Building with joined BuildingEnergy objects
+
+    """
+    buildings = city_model.city_object_member.filter(
+        objectclass=ObjectClass.objects.get(classname="Building")
+    ).select_related("building_obj__building_energy_obj")
+    region = get_region(bbox=bbox, polygon=polygon)
+    if region is not None:
+        buildings = buildings.filter(
+            **{GEOMETRY_LOOKUP + "__intersects": region}
+        ).distinct()
+    return buildings
+
+
+def iter_tiles(city_model, tile_size, buildings=None):
+    """Walk the buildings of a city model tile by tile.
+
+    The extent of the city model is split into square tiles. Each building
+    is part of the first tile it intersects, thus every building is yielded
+    exactly once. Tiles without buildings are skipped.
+
+    Example: import and simulate a large city model in spatial chunks
+
+        for bbox, tile in iter_tiles(city_model, tile_size=1000.0):
+            prj, buildings_not_generated = to_teaser_geometry(
+                city_model, buildings=tile
+            )
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    tile_size : float
+        Edge length of the tiles in units of the coordinate system
+    buildings : Django QuerySet
+        QuerySet of CityObjects to split into tiles, e.g. the result of
+        get_city_buildings() with a polygon. If None, all buildings of the
+        city model are used. (default: None)
+
+    Yields
+    ------
+    bbox : tuple
+        Bounding box (xmin, ymin, xmax, ymax) of the tile
+    tile : list
+        CityObjects of class Building of the tile
+
+    """
+    if buildings is None:
+        buildings = get_city_buildings(city_model=city_model)
+    extent = buildings.aggregate(extent=Extent(GEOMETRY_LOOKUP))["extent"]
+    if extent is None:
+        return
+
+    xmin, ymin, xmax, ymax = extent
+    seen = set()
+    for x in np.arange(xmin, xmax + tile_size, tile_size).tolist():
+        if x > xmax:
+            break
+        for y in np.arange(ymin, ymax + tile_size, tile_size).tolist():
+            if y > ymax:
+                break
+            bbox = (x, y, x + tile_size, y + tile_size)
+            tile = []
+            for building in buildings.filter(
+                **{GEOMETRY_LOOKUP + "__intersects": Polygon.from_bbox(bbox)}
+            ).distinct():
+                if building.pk not in seen:
+                    seen.add(building.pk)
+                    tile.append(building)
+            if tile:
+                yield bbox, tile
+
+
+def iter_building_chunks(
+    city_model,
+    buildings=None,
+    lookups=ELEMENT_LOOKUPS,
+    chunk_size=CHUNK_SIZE,
+    annotations=None,
+):
+    """Yield chunks of BuildingEnergy objects with prefetched object graph.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are imported.
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are streamed from the database with a
+        server-side cursor. (default: None)
+    lookups : list
+        Prefetch lookups starting at EnergyBuilding (default: ELEMENT_LOOKUPS)
+    chunk_size : int
+        Number of buildings that are fetched and prefetched together
+        (default: 200)
+    annotations : list
+        Functions that are called with each chunk after prefetching to
+        attach further bulk loaded data to the buildings, e.g.
+        footprint_facades.annotate_footprint_facades (default: None)
+
+    Yields
+    ------
+    chunk : list
+        List of BuildingEnergy objects with filled prefetch cache
+
+    """
+    if buildings is None:
+        buildings = get_city_buildings(city_model=city_model).iterator(
+            chunk_size=chunk_size
+        )
+
+    if annotations is None:
+        annotations = []
+
+    # the buildings are fetched and prefetched with routers.read_from_replica(),
+    # the code that consumes the chunks keeps its own routing
+    buildings = iter(buildings)
+    while True:
+        with routers.read_from_replica():
+            chunk = [
+                building.building_obj.building_energy_obj
+                for building in itertools.islice(buildings, chunk_size)
+            ]
+            if not chunk:
+                return
+            _load_chunk(chunk, lookups, annotations)
+        yield chunk
+
+
+def _load_chunk(chunk, lookups, annotations):
+    """Prefetch related objects and apply annotations for one chunk."""
+    prefetch_related_objects(chunk, *lookups)
+    for annotate in annotations:
+        annotate(chunk)
+
+
+def filter_boundaries(zone, thermal_boundary_type):
+    """Return thermal boundaries of a zone with the given type.
+
+    Filters in Python to make use of the prefetch cache of the zone.
+
+    Parameters
+    ----------
+    zone : ThermalZone instance
+        ThermalZone instance with prefetched thermal boundaries
+    thermal_boundary_type : str
+        Type of the thermal boundary, e.g. 'OuterWall', 'Roof', 'GroundSlab'
+
+    Returns
+    -------
+    boundaries : list
+        List of ThermalBoundary objects ordered by primary key
+
+    """
+    return [
+        bound
+        for bound in zone.thermal_boundary_obj.all()
+        if bound.thermal_boundary_type == thermal_boundary_type
+    ]
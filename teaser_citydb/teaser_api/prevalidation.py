@@ -0,0 +1,255 @@
+"""Module to classify buildings before they are imported into TEASER.
+
+The element importer needs a mapped BWZK code, a valid storey height and
+outer walls, roofs and ground slabs in the thermal zone of a building. If
+one of these is missing, it is only noticed after the TEASER building has
+been created. The functions in this module label the buildings of a chunk
+with a few aggregate queries up front, thus every building can be
+dispatched to the right importer without wasted work:
+
+    ELEMENT_COMPLETE: all boundary types are present, use the element import
+    GEOMETRY_ONLY: boundaries are missing, use the geometry import
+    UNMAPPABLE: the BWZK code is not mapped or has no archetype, the
+        building is skipped
+    INVALID_HEIGHT: no storeys or no height, the building is skipped
+"""
+import collections
+from citydb.models import EnergyBuilding
+from teaser_citydb.models import BWZKMapping
+from teaser_citydb.models import mapping_registry
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
+
+ELEMENT_COMPLETE = "element_complete"
+GEOMETRY_ONLY = "geometry_only"
+UNMAPPABLE = "unmappable"
+INVALID_HEIGHT = "invalid_height"
+
+REQUIRED_BOUNDARIES = ("OuterWall", "Roof", "GroundSlab")
+
+ZONE_LOOKUP = "thermal_zones__pk"
+BOUNDARY_TYPE_LOOKUP = "thermal_zones__thermal_boundary_obj__thermal_boundary_type"
+
+
+def classify(function, storeys_above_ground, measured_height, boundary_types):
+    """Return the class of a building.
+
+    Parameters
+    ----------
+    function : str
+        BWZK code of the building
+    storeys_above_ground : int
+        Number of storeys above ground
+    measured_height : float
+        Measured height of the building
+    boundary_types : set
+        Types of the thermal boundaries of the first thermal zone
+
+    Returns
+    -------
+    building_class : str
+        One of ELEMENT_COMPLETE, GEOMETRY_ONLY, UNMAPPABLE, INVALID_HEIGHT
+
+    """
+    try:
+        if mapping_registry.get_archetype(function) is None:
+            return UNMAPPABLE
+    except BWZKMapping.DoesNotExist:
+        return UNMAPPABLE
+    if (
+        storeys_above_ground is None
+        or int(storeys_above_ground) == 0
+        or measured_height is None
+    ):
+        return INVALID_HEIGHT
+    if all(bound_type in boundary_types for bound_type in REQUIRED_BOUNDARIES):
+        return ELEMENT_COMPLETE
+    return GEOMETRY_ONLY
+
+
+def get_boundary_types(building_ids):
+    """Return the thermal boundary types of the first zone of buildings.
+
+    The types of all buildings are fetched with one grouped query. As in
+    the importers, the first thermal zone is the one with the lowest
+    primary key.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    boundary_types : dict
+        Dictionary with BuildingEnergy primary key as key and a set of
+        thermal boundary types as value. Buildings without thermal zone are
+        not part of the result.
+
+    """
+    rows = (
+        EnergyBuilding.objects.filter(pk__in=building_ids)
+        .values_list("pk", ZONE_LOOKUP, BOUNDARY_TYPE_LOOKUP)
+        .distinct()
+        .order_by()
+    )
+    first_zones = {}
+    zone_types = collections.defaultdict(set)
+    for building_id, zone_id, bound_type in rows:
+        if zone_id is None:
+            continue
+        if building_id not in first_zones or zone_id < first_zones[building_id]:
+            first_zones[building_id] = zone_id
+        if bound_type is not None:
+            zone_types[zone_id].add(bound_type)
+    return {
+        building_id: zone_types[zone_id] for building_id, zone_id in first_zones.items()
+    }
+
+
+def annotate_building_classes(building_energies):
+    """Attach the class of the building to BuildingEnergy objects.
+
+    Sets the attribute building_class of each building. Used as annotation
+    in prefetch_buildings.iter_building_chunks().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    boundary_types = get_boundary_types([bldg.pk for bldg in building_energies])
+    for bldg in building_energies:
+        bldg.building_class = classify(
+            bldg.function,
+            bldg.storeys_above_ground,
+            bldg.measured_height,
+            boundary_types.get(bldg.pk, set()),
+        )
+
+
+def annotate_element_footprints(building_energies):
+    """Attach footprints to the ELEMENT_COMPLETE buildings of a chunk.
+
+    Must be applied after annotate_building_classes(), see
+    footprints.annotate_footprints().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    footprints.annotate_footprints(
+        [bldg for bldg in building_energies if bldg.building_class == ELEMENT_COMPLETE]
+    )
+
+
+def annotate_geometry_facades(building_energies):
+    """Attach facades to the GEOMETRY_ONLY buildings of a chunk.
+
+    Must be applied after annotate_building_classes(), see
+    footprint_facades.annotate_footprint_facades().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    footprint_facades.annotate_footprint_facades(
+        [bldg for bldg in building_energies if bldg.building_class == GEOMETRY_ONLY]
+    )
+
+
+# Annotations of importers that dispatch on the class of the building
+DISPATCH_ANNOTATIONS = [
+    annotate_building_classes,
+    annotate_element_footprints,
+    annotate_geometry_facades,
+]
+
+
+def get_building_class(building_energy):
+    """Return the class of a building.
+
+    Uses the result of annotate_building_classes() if present, otherwise
+    the boundary types are taken from the related objects of the building.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building that is classified
+
+    Returns
+    -------
+    building_class : str
+        One of ELEMENT_COMPLETE, GEOMETRY_ONLY, UNMAPPABLE, INVALID_HEIGHT
+
+    """
+    building_class = getattr(building_energy, "building_class", None)
+    if building_class is None:
+        boundary_types = set()
+        zone = building_energy.thermal_zones.first()
+        if zone is not None:
+            boundary_types = {
+                bound.thermal_boundary_type for bound in zone.thermal_boundary_obj.all()
+            }
+        building_class = classify(
+            building_energy.function,
+            building_energy.storeys_above_ground,
+            building_energy.measured_height,
+            boundary_types,
+        )
+    return building_class
+
+
+def count_building_classes(
+    city_model, bbox=None, polygon=None, chunk_size=prefetch.CHUNK_SIZE
+):
+    """Count the buildings of a city model per class.
+
+    Only the fields needed for the classification are fetched, two queries
+    per chunk of buildings. Useful to check a city model before a long
+    import.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are classified.
+    bbox : tuple
+        Bounding box (xmin, ymin, xmax, ymax), see
+        prefetch_buildings.get_city_buildings() (default: None)
+    polygon : GEOSGeometry
+        Polygon of the region, see prefetch_buildings.get_city_buildings()
+        (default: None)
+    chunk_size : int
+        Number of buildings that are classified together (default: 200)
+
+    Returns
+    -------
+    counts : collections.Counter
+        Number of buildings per class
+
+    """
+    building_ids = prefetch.get_city_buildings(
+        city_model=city_model, bbox=bbox, polygon=polygon
+    ).values_list("building_obj__building_energy_obj", flat=True)
+    building_ids = [pk for pk in building_ids if pk is not None]
+
+    counts = collections.Counter()
+    for start in range(0, len(building_ids), chunk_size):
+        chunk_ids = building_ids[start : start + chunk_size]
+        boundary_types = get_boundary_types(chunk_ids)
+        rows = EnergyBuilding.objects.filter(pk__in=chunk_ids).values_list(
+            "pk", "function", "storeys_above_ground", "measured_height"
+        )
+        for building_id, function, storeys, height in rows:
+            counts[
+                classify(
+                    function, storeys, height, boundary_types.get(building_id, set())
+                )
+            ] += 1
+    return counts
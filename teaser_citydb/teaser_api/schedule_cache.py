@@ -0,0 +1,114 @@
+"""Module to cache resampled schedule series of usage zones.
+
+Most thermal zones use the same standard schedules of TEASER (occupants,
+machines, lighting, heating and cooling). The resampled values of a
+time series file are cached with a bounded least recently used (LRU) cache,
+thus each schedule is loaded from the time series store only once per
+process. Materialized hourly schedules (see hourly_schedules) are used
+instead of resampling if available.
+
+The values are cached as list and handed out without copying, thus all
+thermal zones with the same schedule share one list instead of
+materializing a list of 8760 values per zone. TEASER expects lists for the
+profiles of use conditions (other values are repeated as daily profile and
+are not serializable by the JSON export of TEASER).
+"""
+from collections import OrderedDict
+from collections import namedtuple
+import teaser_citydb.teaser_api.hourly_schedules as hourly_schedules
+
+SCHEDULE_CACHE_SIZE = 128
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class ScheduleCache(object):
+    """Bounded LRU cache for resampled time series values.
+
+    Entries are keyed by (file_id, column, start, end, mean) of the time
+    series file. If the cache is full, the least recently used entry is
+    dropped. The cache does not notice schedules that are rewritten (e.g. by
+    from_teaser), thus importers clear it at the start of each run.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of cached series (default: 128)
+
+    Attributes
+    ----------
+    hits : int
+        Number of requests answered from the cache
+    misses : int
+        Number of requests that loaded the series from the time series store
+
+    """
+
+    def __init__(self, maxsize=SCHEDULE_CACHE_SIZE):
+        """Init function of ScheduleCache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+
+    def get_profile(self, series, column, start, end, mean):
+        """Return the resampled values of a time series file as list.
+
+        Hourly means are read from the materialized HourlySchedule if
+        present, otherwise the time series is resampled.
+
+        Parameters
+        ----------
+        series : TimeSeriesFile instance
+            Time series file of citydb
+        column : str
+            Column of the resampled values, e.g. 'mean_persons_profile'
+        start : datetime
+            Start of the requested period
+        end : datetime
+            End of the requested period
+        mean : str
+            Resample interval, e.g. '1h'
+
+        Returns
+        -------
+        profile : list
+            Resampled values of the time series file as floats. The same
+            list is returned to all callers and assigned to the use
+            conditions of all zones with this schedule, thus it must not be
+            modified in place. Use a copy (list(profile)) to change the
+            values for a single zone.
+
+        """
+        key = (series.file_id, column, start, end, mean)
+        try:
+            profile = self._values.pop(key)
+        except KeyError:
+            self.misses += 1
+            profile = None
+            if mean == "1h":
+                profile = hourly_schedules.get_hourly_values(
+                    series.file_id, start=start, end=end
+                )
+            if profile is None:
+                series.get_values(start=start, end=end, mean=mean, query=None)
+                profile = series.values[column].tolist()
+        else:
+            self.hits += 1
+        self._values[key] = profile
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+        return profile
+
+    def cache_info(self):
+        """Return hits, misses, maximum and current size of the cache."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._values))
+
+    def clear(self):
+        """Drop all cached series and reset the counters."""
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+schedule_cache = ScheduleCache()
@@ -0,0 +1,518 @@
+"""Module to import buildings from a snapshot without database.
+
+Simulation campaigns import the same city model many times. write_snapshot()
+stores everything the _import_building_* functions of the to_teaser_*
+modules read (attributes of the buildings, mapped archetypes, footprints,
+facades, window areas, thermal boundaries with layers and openings, usage
+zones) denormalized in one compressed Parquet file per city model, one row
+per building. Nested data is stored as JSON.
+
+read_snapshot() restores lightweight building objects that provide the
+attributes and annotations the importers use, thus the importers run
+unchanged but without database queries. to_teaser_snapshot() imports a
+snapshot in any of the import modes of import_buildings.IMPORT_MODES.
+Buildings without footprint in the snapshot are reported as not generated
+in all modes except 'archetype', which does not use the footprint.
+
+Reading a snapshot needs configured Django apps (for the mapping registry)
+but no database connection. Writing and reading Parquet files needs pandas
+and pyarrow (or fastparquet).
+"""
+import collections
+import datetime
+import json
+import numpy as np
+from teaser_citydb.models import BWZKMapping
+from teaser_citydb.models import UsageMapping
+from teaser_citydb.models import mapping_registry
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+import teaser_citydb.teaser_api.import_buildings as import_buildings
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
+import teaser_citydb.teaser_api.window_areas as window_area_sums
+import teaser_citydb.teaser_api.boundary_table as boundary_table
+import teaser_citydb.teaser_api.prevalidation as prevalidation
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+from teaser_citydb.teaser_api.archetype_cache import archetype_cache
+from teaser_citydb.teaser_api.layer_cache import layer_cache
+
+SNAPSHOT_VERSION = 1
+
+COMPRESSION = "snappy"
+
+SNAPSHOT_ANNOTATIONS = [
+    footprints.annotate_footprints,
+    footprint_facades.annotate_footprint_facades,
+    window_area_sums.annotate_window_areas,
+    boundary_table.annotate_boundary_tables,
+]
+
+SNAPSHOT_MODES = [
+    "archetype",
+    "geometry",
+    "element",
+    "errors",
+    "window",
+    "usage_zone",
+    "window_usage_zone",
+]
+
+_COLUMNS = [
+    "pk",
+    "gmlid",
+    "function",
+    "archetype",
+    "archetype_mapped",
+    "usage_zones",
+    "year_of_construction",
+    "storeys_above_ground",
+    "measured_height",
+    "floor_area",
+    "building_class",
+    "footprint",
+    "facade",
+    "window_areas",
+    "zones",
+    "boundaries",
+]
+
+
+class _Related(list):
+    """List that answers .all() and .first() like a related manager."""
+
+    def all(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+
+class SnapshotConstruction(object):
+    """Construction of a snapshot with its layer description.
+
+    layer_cache.get_layers() uses layer_description instead of the layers
+    of the construction.
+    """
+
+    def __init__(self, pk, layer_description):
+        self.pk = pk
+        self.layer_description = layer_description
+
+
+class SnapshotBoundary(object):
+    """Thermal boundary of a snapshot, only used for its construction."""
+
+    def __init__(self, pk, construction):
+        self.pk = pk
+        self.construction = construction
+
+
+class SnapshotUsageZone(object):
+    """Usage zone of a snapshot."""
+
+    def __init__(self, usage_zone_type):
+        self.usage_zone_type = usage_zone_type
+
+
+class SnapshotZone(object):
+    """Thermal zone of a snapshot."""
+
+    def __init__(self, floor_area, usage_zone_type, boundaries=None):
+        self.floor_area = floor_area
+        self.usage_zone = _Related([SnapshotUsageZone(usage_zone_type)])
+        self.thermal_boundary_obj = _Related(boundaries or [])
+
+
+class SnapshotBuilding(object):
+    """Building of a snapshot that replaces BuildingEnergy in the importers.
+
+    Parameters
+    ----------
+    record : dict
+        Row of the snapshot, see get_building_record()
+
+    """
+
+    def __init__(self, record):
+        """Init function of SnapshotBuilding."""
+        self.pk = record["pk"]
+        self.gmlid = record["gmlid"]
+        self.function = record["function"]
+        self.year_of_construction = None
+        if record["year_of_construction"] is not None:
+            self.year_of_construction = datetime.date(
+                int(record["year_of_construction"]), 1, 1
+            )
+        self.storeys_above_ground = record["storeys_above_ground"]
+        self.measured_height = record["measured_height"]
+        self.floor_area = record["floor_area"]
+        self.building_class = record["building_class"]
+
+        self.footprint_shape = None
+        footprint = json.loads(record["footprint"])
+        if footprint is not None:
+            self.footprint_shape = (
+                [np.array(ring, dtype=float) for ring in footprint["rings"]],
+                footprint["area"],
+                footprint["length"],
+            )
+
+        self.footprint_facade = None
+        facade = json.loads(record["facade"])
+        if facade is not None:
+            self.footprint_facade = {
+                "footprint_area": facade["footprint_area"],
+                "facade_length": collections.OrderedDict(
+                    (orientation, length)
+                    for orientation, length in facade["facade_length"]
+                ),
+            }
+
+        self.window_areas = {
+            azimuth: area for azimuth, area in json.loads(record["window_areas"])
+        }
+
+        self.boundary_table = collections.OrderedDict()
+        boundaries = []
+        for thermal_boundary_type, rows in json.loads(record["boundaries"]):
+            table_rows = self.boundary_table.setdefault(thermal_boundary_type, [])
+            for row in rows:
+                table_rows.append(
+                    boundary_table.BoundaryRow(
+                        pk=row["pk"],
+                        area=row["area"],
+                        azimuth=row["azimuth"],
+                        tilt=row["tilt"],
+                        u_value=row["u_value"],
+                        windows=[
+                            boundary_table.WindowRow(area=area, u_value=u_value)
+                            for area, u_value in row["windows"]
+                        ],
+                    )
+                )
+                layers = row["layers"]
+                if layers is not None:
+                    layers = collections.OrderedDict(
+                        (l, collections.OrderedDict(layer))
+                        for l, layer in enumerate(layers)
+                    )
+                boundaries.append(
+                    SnapshotBoundary(
+                        row["pk"],
+                        SnapshotConstruction(row["construction"], layers),
+                    )
+                )
+
+        zones = []
+        for i, (floor_area, usage_zone_type) in enumerate(json.loads(record["zones"])):
+            zones.append(
+                SnapshotZone(
+                    floor_area, usage_zone_type, boundaries if i == 0 else None
+                )
+            )
+        self.thermal_zones = _Related(zones)
+
+
+def _get_footprint(building_energy):
+    """Return the footprint of a building for the snapshot."""
+    if getattr(building_energy, "footprint_shape", None) is None:
+        return None
+    rings, area, length = building_energy.footprint_shape
+    return {"rings": [ring.tolist() for ring in rings], "area": area, "length": length}
+
+
+def _get_facade(building_energy):
+    """Return the footprint facade of a building for the snapshot."""
+    footprint_facade = getattr(building_energy, "footprint_facade", None)
+    if footprint_facade is None:
+        return None
+    return {
+        "footprint_area": footprint_facade["footprint_area"],
+        "facade_length": list(footprint_facade["facade_length"].items()),
+    }
+
+
+def _get_boundaries(building_energy):
+    """Return the boundary table of a building with layers for the snapshot."""
+    zone = building_energy.thermal_zones.first()
+    constructions = {}
+    if zone is not None:
+        constructions = {
+            bound.pk: bound.construction for bound in zone.thermal_boundary_obj.all()
+        }
+
+    boundaries = []
+    table = boundary_table.get_building_boundaries(building_energy)
+    for thermal_boundary_type, rows in table.items():
+        boundary_rows = []
+        for row in rows:
+            construction = constructions.get(row.pk)
+            layers = None
+            if construction is not None:
+                layers = layer_cache.get_layers(construction)
+            if layers is not None:
+                layers = list(layers.values())
+            boundary_rows.append(
+                {
+                    "pk": row.pk,
+                    "area": row.area,
+                    "azimuth": row.azimuth,
+                    "tilt": row.tilt,
+                    "u_value": row.u_value,
+                    "windows": [[win.area, win.u_value] for win in row.windows],
+                    "construction": getattr(construction, "pk", None),
+                    "layers": layers,
+                }
+            )
+        boundaries.append([thermal_boundary_type, boundary_rows])
+    return boundaries
+
+
+def _get_mapping(get_mapping, key):
+    """Return a mapping and whether the key is part of the mapping table."""
+    try:
+        return get_mapping(key), True
+    except (BWZKMapping.DoesNotExist, UsageMapping.DoesNotExist):
+        return None, False
+
+
+def get_building_record(building_energy):
+    """Return the row of a building in the snapshot.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building with prefetched SNAPSHOT_LOOKUPS and SNAPSHOT_ANNOTATIONS
+
+    Returns
+    -------
+    record : dict
+        Columns of the row, nested data is encoded as JSON
+
+    """
+    archetype, archetype_mapped = _get_mapping(
+        mapping_registry.get_archetype, building_energy.function
+    )
+    zones = []
+    usage_zones = {}
+    for zone in building_energy.thermal_zones.all():
+        usage = zone.usage_zone.first()
+        usage_zone_type = None if usage is None else usage.usage_zone_type
+        usage_zone, usage_mapped = _get_mapping(
+            mapping_registry.get_usage_zone, usage_zone_type
+        )
+        if usage_mapped:
+            usage_zones[usage_zone_type] = usage_zone
+        floor_area = None if zone.floor_area is None else float(zone.floor_area)
+        zones.append([floor_area, usage_zone_type])
+
+    window_areas, _ = window_area_sums.get_building_window_areas(building_energy)
+    year = building_energy.year_of_construction
+    storeys = building_energy.storeys_above_ground
+    return {
+        "pk": building_energy.pk,
+        "gmlid": building_energy.gmlid,
+        "function": building_energy.function,
+        "archetype": archetype,
+        "archetype_mapped": archetype_mapped,
+        "usage_zones": json.dumps(list(usage_zones.items())),
+        "year_of_construction": None if year is None else year.year,
+        "storeys_above_ground": None if storeys is None else int(storeys),
+        "measured_height": (
+            None
+            if building_energy.measured_height is None
+            else float(building_energy.measured_height)
+        ),
+        "floor_area": (
+            None
+            if building_energy.floor_area is None
+            else float(building_energy.floor_area)
+        ),
+        "building_class": prevalidation.get_building_class(building_energy),
+        "footprint": json.dumps(_get_footprint(building_energy)),
+        "facade": json.dumps(_get_facade(building_energy)),
+        "window_areas": json.dumps(list(window_areas.items())),
+        "zones": json.dumps(zones),
+        "boundaries": json.dumps(_get_boundaries(building_energy)),
+    }
+
+
+def write_snapshot(
+    city_model,
+    path,
+    buildings=None,
+    bbox=None,
+    polygon=None,
+    chunk_size=prefetch.CHUNK_SIZE,
+):
+    """Write the importer inputs of a city model to a Parquet file.
+
+    Parameters
+    ----------
+    city_model : CityModel instance
+        CityModel instance of the buildings that are stored.
+    path : str
+        Path of the Parquet file
+    buildings : Django QuerySet, list or any other iterable
+        Iterable collection of CityObjects of class Building. If None, all
+        buildings of the city model are stored. (default: None)
+    bbox : tuple
+        Select buildings in a bounding box, only used if buildings is None
+        (default: None)
+    polygon : GEOSGeometry
+        Select buildings in a polygon, only used if buildings is None
+        (default: None)
+    chunk_size : int
+        Number of buildings that are fetched together (default: 200)
+
+    Returns
+    -------
+    number_of_buildings : int
+        Number of buildings in the snapshot
+
+    """
+    import pandas as pd
+
+    if buildings is None and (bbox is not None or polygon is not None):
+        buildings = prefetch.get_city_buildings(
+            city_model=city_model, bbox=bbox, polygon=polygon
+        ).iterator(chunk_size=chunk_size)
+
+    layer_cache.clear()
+    records = []
+    for chunk in prefetch.iter_building_chunks(
+        city_model=city_model,
+        buildings=buildings,
+        lookups=prefetch.SNAPSHOT_LOOKUPS,
+        chunk_size=chunk_size,
+        annotations=SNAPSHOT_ANNOTATIONS,
+    ):
+        for building_energy in chunk:
+            records.append(get_building_record(building_energy))
+
+    snapshot = pd.DataFrame(records, columns=_COLUMNS)
+    snapshot["snapshot_version"] = SNAPSHOT_VERSION
+    snapshot["city_model"] = city_model.name
+    snapshot.to_parquet(path, compression=COMPRESSION, index=False)
+    return len(records)
+
+
+def read_snapshot(path):
+    """Read the buildings and mappings of a snapshot.
+
+    The mappings are only returned, see to_teaser_snapshot() for their use
+    in the mapping registry.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Parquet file written with write_snapshot()
+
+    Returns
+    -------
+    city_model_name : str
+        Name of the city model of the snapshot
+    buildings : list
+        List of SnapshotBuilding objects
+    mappings : tuple
+        BWZK mapping (BWZK number and archetype name) and usage zone mapping
+        (DIN 277-2 class and usage zone name) of the buildings as dicts
+
+    """
+    import pandas as pd
+
+    snapshot = pd.read_parquet(path)
+    snapshot = snapshot.astype(object).where(snapshot.notnull(), None)
+    if len(snapshot) and snapshot["snapshot_version"].iloc[0] != SNAPSHOT_VERSION:
+        raise ValueError(
+            "Snapshot {} has version {}, expected {}".format(
+                path, snapshot["snapshot_version"].iloc[0], SNAPSHOT_VERSION
+            )
+        )
+
+    archetypes = {}
+    usage_zones = {}
+    buildings = []
+    for record in snapshot.to_dict("records"):
+        if record["archetype_mapped"]:
+            archetypes[record["function"]] = record["archetype"]
+        usage_zones.update(
+            {din_277: usage for din_277, usage in json.loads(record["usage_zones"])}
+        )
+        buildings.append(SnapshotBuilding(record))
+
+    city_model_name = None
+    if len(snapshot):
+        city_model_name = snapshot["city_model"].iloc[0]
+    return city_model_name, buildings, (archetypes, usage_zones)
+
+
+def _has_footprint(building, mode):
+    """Return whether a building has the footprint an import mode needs.
+
+    The element modes split the footprint, the other modes except
+    'archetype' need the footprint facade or the footprint to compute it.
+    """
+    if mode == "archetype" or building.footprint_shape is not None:
+        return True
+    return mode not in ("element", "errors") and building.footprint_facade is not None
+
+
+def to_teaser_snapshot(path, mode="element"):
+    """Import the buildings of a snapshot into a new TEASER project.
+
+    The mappings of the snapshot are set in the mapping registry during the
+    import, thus the importers do not query the mapping tables. Afterwards
+    the registry is invalidated, so later imports in the same process load
+    the mapping tables again.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Parquet file written with write_snapshot()
+    mode : str
+        Name of the import mode, one of SNAPSHOT_MODES (default: 'element')
+
+    Returns
+    -------
+    prj : teaser.Project()
+        Project with the imported buildings
+    buildings_not_generated : list
+        List of gmlids of buildings that could not be generated, including
+        buildings without footprint in the snapshot.
+
+    """
+    if mode not in SNAPSHOT_MODES:
+        raise ValueError(
+            "Import mode {} is not supported for snapshots, use one of {}".format(
+                mode, SNAPSHOT_MODES
+            )
+        )
+    import_function, _, _ = import_buildings.get_import_mode(mode)
+    city_model_name, buildings, mappings = read_snapshot(path)
+
+    prj = teaser_data.new_project(name=city_model_name)
+    layer_cache.clear()
+    archetype_cache.clear()
+    buildings_not_generated = []
+    mapping_registry.set_mappings(*mappings)
+    try:
+        for building in buildings:
+            if not _has_footprint(building, mode):
+                # the importers would load the missing footprint from the
+                # database
+                buildings_not_generated.append(building.gmlid)
+                continue
+            result = import_function(
+                building_energy=building,
+                project=prj,
+                buildings_not_generated=buildings_not_generated,
+            )
+            if isinstance(result, tuple):
+                buildings_not_generated = result[0]
+            else:
+                buildings_not_generated = result
+    finally:
+        mapping_registry.invalidate()
+
+    return prj, buildings_not_generated
@@ -0,0 +1,48 @@
+"""Module to share the input data of TEASER across imports.
+
+Project(load_data=True) parses the type elements and use conditions of
+TEASER each time a project is created. The data is only read during the
+import, thus it is loaded once per process and shared by all projects
+created with new_project(). Worker processes that are forked after the
+data is loaded inherit it copy-on-write and skip the loading as well.
+"""
+from teaser.project import Project
+
+_data = None
+
+
+def get_data():
+    """Return the shared input data of TEASER, load it on first call.
+
+    Returns
+    -------
+    data : teaser.data.dataclass.DataClass()
+        Type elements and use conditions of TEASER. The data is shared and
+        must be treated as read-only.
+
+    """
+    global _data
+    if _data is None:
+        _data = Project(load_data=True).data
+    return _data
+
+
+def new_project(name=None):
+    """Return a new TEASER project using the shared input data.
+
+    Parameters
+    ----------
+    name : str
+        Name of the project (default: None keeps the default name of TEASER)
+
+    Returns
+    -------
+    prj : teaser.Project()
+        Project instance of TEASER with loaded data
+
+    """
+    prj = Project(load_data=False)
+    prj.data = get_data()
+    if name is not None:
+        prj.name = name
+    return prj
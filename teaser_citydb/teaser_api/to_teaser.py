@@ -1,20 +1,6 @@
+import collections
 from citydb.models import ObjectClass
-from teaser.project import Project
 from datetime import datetime as dt
-from teaser.logic.archetypebuildings.tabula.de.singlefamilyhouse import (
-    SingleFamilyHouse,
-)
-from teaser.logic.archetypebuildings.tabula.de.multifamilyhouse import MultiFamilyHouse
-from teaser.logic.archetypebuildings.tabula.de.terracedhouse import TerracedHouse
-from teaser.logic.archetypebuildings.tabula.de.apartmentblock import ApartmentBlock
-from teaser.logic.archetypebuildings.bmvbs.office import Office
-from teaser.logic.buildingobjects.building import Building
-from teaser.logic.archetypebuildings.bmvbs.custom.institute import Institute
-from teaser.logic.archetypebuildings.bmvbs.custom.institute4 import Institute4
-from teaser.logic.archetypebuildings.bmvbs.custom.institute8 import Institute8
-from teaser.logic.archetypebuildings.bmvbs.singlefamilydwelling import (
-    SingleFamilyDwelling,
-)
 from teaser.logic.buildingobjects.thermalzone import ThermalZone
 from teaser.logic.buildingobjects.useconditions import UseConditions
 from teaser.logic.buildingobjects.buildingsystems.buildingahu import BuildingAHU
@@ -28,46 +14,36 @@ from teaser.logic.buildingobjects.buildingphysics.door import Door
 from teaser.logic.buildingobjects.buildingphysics.window import Window
 from teaser.logic.buildingobjects.buildingphysics.layer import Layer
 from teaser.logic.buildingobjects.buildingphysics.material import Material
-import django
-
-django.setup()
-from teaser_citydb.models import BWZKMapping
-
-BUILDING_CLASS = {
-    "Office": {"method": "bmvbs", "teaser_class": Office},
-    "Institute": {"method": "bmvbs", "teaser_class": Institute},
-    "Institute4": {"method": "bmvbs", "teaser_class": Institute4},
-    "Institute8": {"method": "bmvbs", "teaser_class": Institute8},
-    "Building": {"method": "undefined", "teaser_class": Building},
-    "SingleFamilyDwelling": {"method": "iwu", "teaser_class": SingleFamilyDwelling},
-    "SingleFamilyHouse": {"method": "tabula_de", "teaser_class": SingleFamilyHouse},
-    "TerracedHouse": {"method": "tabula_de", "teaser_class": TerracedHouse},
-    "MultiFamilyHouse": {"method": "tabula_de", "teaser_class": MultiFamilyHouse},
-    "ApartmentBlock": {"method": "tabula_de", "teaser_class": ApartmentBlock},
-}
-
-
-def to_teaser_archetype(city_model, buildings=None):
-
-    prj = Project(load_data=True)
-    prj.name = city_model.name
-    buildings_not_generated = []
-    if buildings is None:
-        for building in city_model.city_object_member.filter(
-            objectclass=ObjectClass.objects.get(classname="Building")
-        ):
-            buildings_not_generated = _import_building_archetype(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
-    else:
-        for building in buildings:
-            buildings_not_generated = _import_building_archetype(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
+from teaser_citydb.models import mapping_registry
+import teaser_citydb.routers as routers
+import teaser_citydb.teaser_api.import_buildings as import_buildings
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+from teaser_citydb.teaser_api.schedule_cache import schedule_cache
+from teaser_citydb.teaser_api.archetype_cache import archetype_cache
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+import teaser_citydb.teaser_api.archetypes as archetypes
+
+
+def to_teaser_archetype(
+    city_model, buildings=None, workers=None, bbox=None, polygon=None, cache_dir=None
+):
+
+    prj = teaser_data.new_project(name=city_model.name)
+    archetype_cache.clear()
+    buildings_not_generated, _ = import_buildings.import_buildings(
+        import_function=_import_building_archetype,
+        project=prj,
+        city_model=city_model,
+        buildings=buildings,
+        workers=workers,
+        bbox=bbox,
+        polygon=polygon,
+        cache_dir=cache_dir,
+    )
+    cache_info = archetype_cache.cache_info()
+    print(
+        "Archetype cache: {} hits, {} misses".format(cache_info.hits, cache_info.misses)
+    )
 
     return prj, buildings_not_generated
 
@@ -83,13 +59,14 @@ def _import_building_archetype(building_energy, project, buildings_not_generated
         buildings_not_generated.append(building_energy.gmlid)
         return buildings_not_generated
 
-    if BWZKMapping.objects.get(bwzk=building_energy.function).archetype is not None:
+    if mapping_registry.get_archetype(building_energy.function) is not None:
         print("Import {} to Teaser".format(building_energy.gmlid))
-        bl_class = BUILDING_CLASS[
-            BWZKMapping.objects.get(bwzk=building_energy.function).archetype
-        ]["teaser_class"]
-        bldg = bl_class(
-            parent=project,
+        bl_class = archetypes.get_archetype_class(
+            mapping_registry.get_archetype(building_energy.function)
+        )
+        archetype_cache.generate_archetype(
+            bl_class,
+            project=project,
             name=building_energy.gmlid,
             year_of_construction=building_energy.year_of_construction.year,
             net_leased_area=round(building_energy.floor_area, 0),
@@ -101,7 +78,6 @@ def _import_building_archetype(building_energy, project, buildings_not_generated
             ),
             internal_gains_mode=2,
         )
-        bldg.generate_archetype()
 
         return buildings_not_generated
     else:
@@ -109,21 +85,39 @@ def _import_building_archetype(building_energy, project, buildings_not_generated
         return buildings_not_generated
 
 
+# Classes of TEASER per thermal boundary type, in the order of the import
+BOUNDARY_CLASSES = collections.OrderedDict(
+    [
+        ("outerWall", OuterWall),
+        ("roof", Rooftop),
+        ("groundSlab", GroundFloor),
+        ("interiorWall", InnerWall),
+        ("intermediateFloor", Floor),
+        ("intermediateCeiling", Ceiling),
+        ("door", Door),
+    ]
+)
+
+
+@routers.read_from_replica()
 def to_teaser(city_model):
 
-    prj = Project()
-    prj.name = city_model.name
-    for building in city_model.city_object_member.filter(
-        objectclass=ObjectClass.objects.get(classname="Building")
+    prj = teaser_data.new_project(name=city_model.name)
+    schedule_cache.clear()
+    for chunk in prefetch.iter_building_chunks(
+        city_model=city_model, lookups=prefetch.FULL_LOOKUPS
     ):
-        _import_building(
-            building_energy=building.building_obj.building_energy_obj, project=prj
-        )
+        for building_energy in chunk:
+            _import_building(building_energy=building_energy, project=prj)
+    cache_info = schedule_cache.cache_info()
+    print(
+        "Schedule cache: {} hits, {} misses".format(cache_info.hits, cache_info.misses)
+    )
     return prj
 
 
 def _import_building(building_energy, project):
-    bl_class = BUILDING_CLASS[building_energy.building_type]["teaser_class"]
+    bl_class = archetypes.get_archetype_class(building_energy.building_type)
     bldg = bl_class(parent=project)
     bldg.name = building_energy.gmlid
     bldg.year_of_construction = building_energy.year_of_construction.year
@@ -145,37 +139,15 @@ def _import_thermal_zone(zone_sql, bldg):
     zone.name = zone_sql.name
     zone.area = float(zone_sql.floor_area)
     zone.volume = float(zone_sql.volume)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(
-        thermal_boundary_type="outerWall"
-    ):
-        out_wall = OuterWall(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(thermal_boundary_type="roof"):
-        out_wall = Rooftop(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(
-        thermal_boundary_type="groundSlab"
-    ):
-        out_wall = GroundFloor(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(
-        thermal_boundary_type="interiorWall"
-    ):
-        out_wall = InnerWall(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(
-        thermal_boundary_type="intermediateFloor"
-    ):
-        out_wall = Floor(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(
-        thermal_boundary_type="intermediateCeiling"
-    ):
-        out_wall = Ceiling(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
-    for wall_sql in zone_sql.thermal_boundary_obj.filter(thermal_boundary_type="door"):
-        out_wall = Door(parent=zone)
-        _import_building_element(out_wall, zone, wall_sql)
+
+    # group the prefetched boundaries once instead of one query per type
+    boundaries = collections.defaultdict(list)
+    for wall_sql in zone_sql.thermal_boundary_obj.all():
+        boundaries[wall_sql.thermal_boundary_type].append(wall_sql)
+    for thermal_boundary_type, element_class in BOUNDARY_CLASSES.items():
+        for wall_sql in boundaries[thermal_boundary_type]:
+            out_wall = element_class(parent=zone)
+            _import_building_element(out_wall, zone, wall_sql)
 
     return zone
 
@@ -221,6 +193,23 @@ def _import_window(wall_sql, zone):
             _import_layer(win, lay_sql)
 
 
+def _get_schedule(series, column):
+    """Return one column of the yearly 1h mean of a time series file.
+
+    The values are taken from the schedule cache, thus every schedule is
+    only loaded once (from the materialized hourly schedules if present)
+    and all zones share one list. The list must not be modified in place,
+    assign a copy (list(profile)) to change the schedule of a single zone.
+    """
+    return schedule_cache.get_profile(
+        series,
+        column,
+        start=dt(2014, 1, 1, 0, 0, 0),
+        end=dt(2014, 12, 31, 23, 55, 0),
+        mean="1h",
+    )
+
+
 def _import_use_conditions(zone_sql, zone_teaser):
 
     zone_teaser.use_conditions = UseConditions(parent=zone_teaser)
@@ -239,16 +228,10 @@ def _import_use_conditions(zone_sql, zone_teaser):
         occupants.heat_dissipation.convective_fraction
     )
 
-    series = occupants.occupancy_rate.time_depending_values.time_series_file
-    series.get_values(
-        start=dt(2014, 1, 1, 0, 0, 0),
-        end=dt(2014, 12, 31, 23, 55, 0),
-        mean="1h",
-        query=None,
+    zone_teaser.use_conditions.persons_profile = _get_schedule(
+        occupants.occupancy_rate.time_depending_values.time_series_file,
+        "mean_persons_profile",
     )
-    zone_teaser.use_conditions.persons_profile = series.values[
-        "mean_persons_profile"
-    ].tolist()
 
     machines = usage_sql.facilities.get(
         objectclass=ObjectClass.objects.get(classname="ElectricalAppliances")
@@ -257,16 +240,10 @@ def _import_use_conditions(zone_sql, zone_teaser):
     zone_teaser.use_conditions.ratio_conv_rad_machines = float(
         machines.heat_dissipation.convective_fraction
     )
-    series = machines.operation_schedule.time_depending_values.time_series_file
-    series.get_values(
-        start=dt(2014, 1, 1, 0, 0, 0),
-        end=dt(2014, 12, 31, 23, 55, 0),
-        mean="1h",
-        query=None,
+    zone_teaser.use_conditions.machines_profile = _get_schedule(
+        machines.operation_schedule.time_depending_values.time_series_file,
+        "mean_machines_profile",
     )
-    zone_teaser.use_conditions.machines_profile = series.values[
-        "mean_machines_profile"
-    ].tolist()
 
     lighting = usage_sql.facilities.get(
         objectclass=ObjectClass.objects.get(classname="LightingFacilities")
@@ -275,39 +252,21 @@ def _import_use_conditions(zone_sql, zone_teaser):
         lighting.heat_dissipation.convective_fraction
     )
     zone_teaser.use_conditions.lighting_power = lighting.electrical_power
-    series = lighting.operation_schedule.time_depending_values.time_series_file
-    series.get_values(
-        start=dt(2014, 1, 1, 0, 0, 0),
-        end=dt(2014, 12, 31, 23, 55, 0),
-        mean="1h",
-        query=None,
+    zone_teaser.use_conditions.lighting_profile = _get_schedule(
+        lighting.operation_schedule.time_depending_values.time_series_file,
+        "mean_lighting_profile",
     )
-    zone_teaser.use_conditions.lighting_profile = series.values[
-        "mean_lighting_profile"
-    ].tolist()
 
     zone_teaser.use_conditions.infiltration_rate = float(zone_sql.infiltration_rate)
 
-    heating_series = usage_sql.heating_schedule.time_depending_values.time_series_file
-    heating_series.get_values(
-        start=dt(2014, 1, 1, 0, 0, 0),
-        end=dt(2014, 12, 31, 23, 55, 0),
-        mean="1h",
-        query=None,
+    zone_teaser.use_conditions.heating_profile = _get_schedule(
+        usage_sql.heating_schedule.time_depending_values.time_series_file,
+        "mean_heating_profile",
     )
-    zone_teaser.use_conditions.heating_profile = heating_series.values[
-        "mean_heating_profile"
-    ].tolist()
-    cooling_series = usage_sql.cooling_schedule.time_depending_values.time_series_file
-    cooling_series.get_values(
-        start=dt(2014, 1, 1, 0, 0, 0),
-        end=dt(2014, 12, 31, 23, 55, 0),
-        mean="1h",
-        query=None,
+    zone_teaser.use_conditions.cooling_profile = _get_schedule(
+        usage_sql.cooling_schedule.time_depending_values.time_series_file,
+        "mean_cooling_profile",
     )
-    zone_teaser.use_conditions.cooling_profile = cooling_series.values[
-        "mean_cooling_profile"
-    ].tolist()
 
 
 def _import_central_ahu(building_teaser, building_sql):
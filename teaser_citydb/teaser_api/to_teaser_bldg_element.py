@@ -1,65 +1,41 @@
-from teaser.project import Project
-from teaser.logic.archetypebuildings.tabula.de.singlefamilyhouse import (
-    SingleFamilyHouse,
-)
-from teaser.logic.archetypebuildings.tabula.de.multifamilyhouse import MultiFamilyHouse
-from teaser.logic.archetypebuildings.tabula.de.terracedhouse import TerracedHouse
-from teaser.logic.archetypebuildings.tabula.de.apartmentblock import ApartmentBlock
-from teaser.logic.archetypebuildings.bmvbs.office import Office
-from teaser.logic.buildingobjects.building import Building
-from teaser.logic.archetypebuildings.bmvbs.custom.institute import Institute
-from teaser.logic.archetypebuildings.bmvbs.custom.institute4 import Institute4
-from teaser.logic.archetypebuildings.bmvbs.custom.institute8 import Institute8
-from teaser.logic.archetypebuildings.bmvbs.singlefamilydwelling import (
-    SingleFamilyDwelling,
-)
-import django
 import collections
-
-django.setup()
-from django.contrib.gis.geos import LineString
-from teaser_citydb.models import BWZKMapping
-from citydb.models import ObjectClass
+from teaser_citydb.models import mapping_registry
 import teaser_citydb.teaser_api.to_teaser_geometry as tt_geom
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+import teaser_citydb.teaser_api.import_buildings as import_buildings
+import teaser_citydb.teaser_api.footprint_edges as footprint_edges
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+import teaser_citydb.teaser_api.archetypes as archetypes
+from teaser_citydb.teaser_api.layer_cache import layer_cache
+import teaser_citydb.teaser_api.boundary_defaults as boundary_defaults
+import teaser_citydb.teaser_api.boundary_table as boundary_table
 import warnings
 
-BUILDING_CLASS = {
-    "Office": {"method": "bmvbs", "teaser_class": Office},
-    "Institute": {"method": "bmvbs", "teaser_class": Institute},
-    "Institute4": {"method": "bmvbs", "teaser_class": Institute4},
-    "Institute8": {"method": "bmvbs", "teaser_class": Institute8},
-    "Building": {"method": "undefined", "teaser_class": Building},
-    "SingleFamilyDwelling": {"method": "iwu", "teaser_class": SingleFamilyDwelling},
-    "SingleFamilyHouse": {"method": "tabula_de", "teaser_class": SingleFamilyHouse},
-    "TerracedHouse": {"method": "tabula_de", "teaser_class": TerracedHouse},
-    "MultiFamilyHouse": {"method": "tabula_de", "teaser_class": MultiFamilyHouse},
-    "ApartmentBlock": {"method": "tabula_de", "teaser_class": ApartmentBlock},
-}
-
-
-def to_teaser_element(city_model, buildings=None):
-
-    prj = Project(load_data=True)
-    prj.name = city_model.name
-    buildings_not_generated = []
 
-    if buildings is None:
-        for building in city_model.city_object_member.filter(
-            objectclass=ObjectClass.objects.get(classname="Building")
-        ):
-            buildings_not_generated = _import_building_element(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
-
-    else:
-        for building in buildings:
-            buildings_not_generated = _import_building_element(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
+def to_teaser_element(
+    city_model, buildings=None, workers=None, bbox=None, polygon=None, cache_dir=None
+):
+
+    prj = teaser_data.new_project(name=city_model.name)
+    layer_cache.clear()
+    buildings_not_generated, _ = import_buildings.import_buildings(
+        import_function=_import_building_element,
+        project=prj,
+        city_model=city_model,
+        buildings=buildings,
+        lookups=prefetch.ELEMENT_LOOKUPS,
+        workers=workers,
+        bbox=bbox,
+        polygon=polygon,
+        cache_dir=cache_dir,
+        annotations=[
+            footprints.annotate_footprints,
+            boundary_table.annotate_boundary_tables,
+        ],
+    )
+    cache_info = layer_cache.cache_info()
+    print("Layer cache: {} hits, {} misses".format(cache_info.hits, cache_info.misses))
 
     return prj, buildings_not_generated
 
@@ -75,11 +51,11 @@ def _import_building_element(building_energy, project, buildings_not_generated):
         buildings_not_generated.append(building_energy.gmlid)
         return buildings_not_generated
 
-    if BWZKMapping.objects.get(bwzk=building_energy.function).archetype is not None:
+    if mapping_registry.get_archetype(building_energy.function) is not None:
         print("Import {} to Teaser".format(building_energy.gmlid))
-        bl_class = BUILDING_CLASS[
-            BWZKMapping.objects.get(bwzk=building_energy.function).archetype
-        ]["teaser_class"]
+        bl_class = archetypes.get_archetype_class(
+            mapping_registry.get_archetype(building_energy.function)
+        )
         bldg = bl_class(
             parent=project,
             name=building_energy.gmlid,
@@ -94,228 +70,94 @@ def _import_building_element(building_energy, project, buildings_not_generated):
             internal_gains_mode=2,
         )
 
-        footprint = (
-            building_energy.bldg_thematic_surface.first()
-            .thematic_surface_geom.first()
-            .geometry
+        rings, footprint_area, total_line_length = footprints.get_building_footprint(
+            building_energy
         )
-        total_line_length = footprint.length
-        multi_line = []
-        for ring in footprint:
-            for i, point in enumerate(ring):
-                try:
-                    multi_line.append(LineString(point, ring[i + 1]))
-                except IndexError:
-                    pass
+        lengths, orientations, _ = footprint_edges.get_footprint_edges([rings])
+        edges = list(zip(lengths.tolist(), orientations.tolist()))
         bldg.net_leased_area = (
-            footprint.area * int(building_energy.storeys_above_ground) * 0.85
+            footprint_area * int(building_energy.storeys_above_ground) * 0.85
         )
 
-        zone = building_energy.thermal_zones.all().order_by("pk").first()
+        zone = building_energy.thermal_zones.first()
         outer_wall_gml = {}
         window_gml = {}
         roof_gml = {}
         ground_floor_gml = {}
 
-        for b, bound in enumerate(
-            zone.thermal_boundary_obj.filter(thermal_boundary_type="OuterWall")
-        ):
+        boundaries = boundary_table.get_building_boundaries(building_energy)
+        constructions = {
+            bound.pk: bound.construction for bound in zone.thermal_boundary_obj.all()
+        }
 
+        for b, bound in enumerate(boundaries.get("OuterWall", [])):
             if bound.azimuth is None:
 
-                for i, line in enumerate(multi_line):
+                for i, (length, orientation) in enumerate(edges):
 
                     outer_wall_gml["bound_{}".format(i)] = collections.OrderedDict(
                         {
-                            "area": (
-                                float(bound.area)
-                                / float(zone.floor_area / building_energy.floor_area)
-                            )
-                            * line.length
-                            / total_line_length,
-                            "orientation": tt_geom._get_orientation(line),
-                            "tilt": float(bound.inclination),
-                            "u_value": float(bound.construction.u_value),
-                            "layer": collections.OrderedDict(),
+                            "area": bound.area * length / total_line_length,
+                            "orientation": orientation,
+                            "tilt": bound.tilt,
+                            "u_value": bound.u_value,
+                            "layer": layer_cache.get_layers(constructions[bound.pk]),
                         }
                     )
-                    if len(bound.construction.layer.all()) == 0:
-                        outer_wall_gml["bound_{}".format(i)]["layer"] = None
-                    for l, layer in enumerate(
-                        bound.construction.layer.all().order_by("ordered_position")
-                    ):
-
-                        info_layer = layer.layer_component.first()
-                        outer_wall_gml["bound_{}".format(i)]["layer"][
-                            l
-                        ] = collections.OrderedDict(
-                            {
-                                "position": int(layer.ordered_position),
-                                "thickness": float(info_layer.thickness),
-                                "material": info_layer.material.solid_material_abstract.name,
-                                "density": float(
-                                    info_layer.material.solid_material_abstract.density
-                                ),
-                                "thermal_conduc": float(
-                                    info_layer.material.solid_material_abstract.conductivity
-                                ),
-                                "heat_capac": float(
-                                    info_layer.material.solid_material_abstract.specific_heat
-                                    / 1000
-                                ),
-                            }
-                        )
-                    for window in bound.contains.all():
+                    for window in bound.windows:
                         window_gml["window_{}".format(i)] = collections.OrderedDict(
                             {
-                                "area": (
-                                    float(window.area)
-                                    / float(
-                                        zone.floor_area / building_energy.floor_area
-                                    )
-                                )
-                                * line.length
-                                / total_line_length,
+                                "area": window.area * length / total_line_length,
                                 "type": "Window",
-                                "orientation": tt_geom._get_orientation(line),
-                                "tilt": float(bound.inclination),
-                                "u_value": float(window.construction.u_value),
+                                "orientation": orientation,
+                                "tilt": bound.tilt,
+                                "u_value": window.u_value,
                             }
                         )
             else:
                 outer_wall_gml["bound_{}".format(b)] = collections.OrderedDict(
                     {
-                        "area": float(bound.area)
-                        / float(zone.floor_area / building_energy.floor_area),
-                        "orientation": float(bound.azimuth),
-                        "tilt": float(bound.inclination),
-                        "u_value": float(bound.construction.u_value),
-                        "layer": collections.OrderedDict(),
+                        "area": bound.area,
+                        "orientation": bound.azimuth,
+                        "tilt": bound.tilt,
+                        "u_value": bound.u_value,
+                        "layer": layer_cache.get_layers(constructions[bound.pk]),
                     }
                 )
-                if len(bound.construction.layer.all()) == 0:
-                    outer_wall_gml["bound_{}".format(b)]["layer"] = None
-                for l, layer in enumerate(
-                    bound.construction.layer.all().order_by("ordered_position")
-                ):
 
-                    info_layer = layer.layer_component.first()
-                    outer_wall_gml["bound_{}".format(b)]["layer"][
-                        l
-                    ] = collections.OrderedDict(
-                        {
-                            "position": int(layer.ordered_position),
-                            "thickness": float(info_layer.thickness),
-                            "material": info_layer.material.solid_material_abstract.name,
-                            "density": float(
-                                info_layer.material.solid_material_abstract.density
-                            ),
-                            "thermal_conduc": float(
-                                info_layer.material.solid_material_abstract.conductivity
-                            ),
-                            "heat_capac": float(
-                                info_layer.material.solid_material_abstract.specific_heat
-                                / 1000
-                            ),
-                        }
-                    )
-
-                for window in bound.contains.all():
+                for window in bound.windows:
                     window_gml["window_{}".format(b)] = collections.OrderedDict(
                         {
-                            "area": float(window.area)
-                            / float(zone.floor_area / building_energy.floor_area),
+                            "area": window.area,
                             "type": "Window",
-                            "orientation": float(bound.azimuth),
-                            "tilt": float(bound.inclination),
-                            "u_value": float(window.construction.u_value),
+                            "orientation": bound.azimuth,
+                            "tilt": bound.tilt,
+                            "u_value": window.u_value,
                             "g_value": float(0.7),
                         }
                     )
 
-        for b, bound in enumerate(
-            zone.thermal_boundary_obj.filter(thermal_boundary_type="Roof")
-        ):
-            if bound.azimuth is None:
-                bound.azimuth = 0.0
-                bound.save()
+        for b, bound in enumerate(boundaries.get("Roof", [])):
             roof_gml["bound_{}".format(b)] = collections.OrderedDict(
                 {
-                    "area": float(bound.area)
-                    / float(zone.floor_area / building_energy.floor_area),
-                    "orientation": float(bound.azimuth),
-                    "tilt": float(bound.inclination),
-                    "u_value": float(bound.construction.u_value),
-                    "layer": collections.OrderedDict(),
+                    "area": bound.area,
+                    "orientation": boundary_defaults.get_azimuth(bound),
+                    "tilt": bound.tilt,
+                    "u_value": bound.u_value,
+                    "layer": layer_cache.get_layers(constructions[bound.pk]),
                 }
             )
 
-            if len(bound.construction.layer.all()) == 0:
-                roof_gml["bound_{}".format(b)]["layer"] = None
-            for l, layer in enumerate(
-                bound.construction.layer.all().order_by("ordered_position")
-            ):
-
-                info_layer = layer.layer_component.first()
-                roof_gml["bound_{}".format(b)]["layer"][l] = collections.OrderedDict(
-                    {
-                        "position": int(layer.ordered_position),
-                        "thickness": float(info_layer.thickness),
-                        "material": info_layer.material.solid_material_abstract.name,
-                        "density": float(
-                            info_layer.material.solid_material_abstract.density
-                        ),
-                        "thermal_conduc": float(
-                            info_layer.material.solid_material_abstract.conductivity
-                        ),
-                        "heat_capac": float(
-                            info_layer.material.solid_material_abstract.specific_heat
-                            / 1000
-                        ),
-                    }
-                )
-        for b, bound in enumerate(
-            zone.thermal_boundary_obj.filter(thermal_boundary_type="GroundSlab")
-        ):
-            if bound.azimuth is None:
-                bound.azimuth = 0.0
-                bound.save()
+        for b, bound in enumerate(boundaries.get("GroundSlab", [])):
             ground_floor_gml["bound_{}".format(b)] = collections.OrderedDict(
                 {
-                    "area": float(bound.area)
-                    / float(zone.floor_area / building_energy.floor_area),
-                    "orientation": float(bound.azimuth),
-                    "tilt": float(bound.inclination),
-                    "u_value": float(bound.construction.u_value),
-                    "layer": collections.OrderedDict(),
+                    "area": bound.area,
+                    "orientation": boundary_defaults.get_azimuth(bound),
+                    "tilt": bound.tilt,
+                    "u_value": bound.u_value,
+                    "layer": layer_cache.get_layers(constructions[bound.pk]),
                 }
             )
-            if len(bound.construction.layer.all()) == 0:
-                ground_floor_gml["bound_{}".format(b)]["layer"] = None
-            for l, layer in enumerate(
-                bound.construction.layer.all().order_by("ordered_position")
-            ):
-
-                info_layer = layer.layer_component.first()
-                ground_floor_gml["bound_{}".format(b)]["layer"][
-                    l
-                ] = collections.OrderedDict(
-                    {
-                        "position": int(layer.ordered_position),
-                        "thickness": float(info_layer.thickness),
-                        "material": info_layer.material.solid_material_abstract.name,
-                        "density": float(
-                            info_layer.material.solid_material_abstract.density
-                        ),
-                        "thermal_conduc": float(
-                            info_layer.material.solid_material_abstract.conductivity
-                        ),
-                        "heat_capac": float(
-                            info_layer.material.solid_material_abstract.specific_heat
-                            / 1000
-                        ),
-                    }
-                )
 
         bldg.outer_wall_gml = outer_wall_gml
         bldg.window_gml = window_gml
@@ -1,66 +1,32 @@
-from teaser.project import Project
-from teaser.logic.archetypebuildings.tabula.de.singlefamilyhouse import (
-    SingleFamilyHouse,
-)
-from teaser.logic.archetypebuildings.tabula.de.multifamilyhouse import MultiFamilyHouse
-from teaser.logic.archetypebuildings.tabula.de.terracedhouse import TerracedHouse
-from teaser.logic.archetypebuildings.tabula.de.apartmentblock import ApartmentBlock
-from teaser.logic.archetypebuildings.bmvbs.office import Office
-from teaser.logic.buildingobjects.building import Building
-from teaser.logic.archetypebuildings.bmvbs.custom.institute import Institute
-from teaser.logic.archetypebuildings.bmvbs.custom.institute4 import Institute4
-from teaser.logic.archetypebuildings.bmvbs.custom.institute8 import Institute8
-from teaser.logic.archetypebuildings.bmvbs.singlefamilydwelling import (
-    SingleFamilyDwelling,
-)
-import django
-
-django.setup()
-from django.contrib.gis.geos import LineString
-from teaser_citydb.models import BWZKMapping
-from citydb.models import ObjectClass
-import teaser_citydb.teaser_api.to_teaser_geometry as tt_geom
-
-BUILDING_CLASS = {
-    "Office": {"method": "bmvbs", "teaser_class": Office},
-    "Institute": {"method": "bmvbs", "teaser_class": Institute},
-    "Institute4": {"method": "bmvbs", "teaser_class": Institute4},
-    "Institute8": {"method": "bmvbs", "teaser_class": Institute8},
-    "Building": {"method": "undefined", "teaser_class": Building},
-    "SingleFamilyDwelling": {"method": "iwu", "teaser_class": SingleFamilyDwelling},
-    "SingleFamilyHouse": {"method": "tabula_de", "teaser_class": SingleFamilyHouse},
-    "TerracedHouse": {"method": "tabula_de", "teaser_class": TerracedHouse},
-    "MultiFamilyHouse": {"method": "tabula_de", "teaser_class": MultiFamilyHouse},
-    "ApartmentBlock": {"method": "tabula_de", "teaser_class": ApartmentBlock},
-}
-
-
-def to_teaser_window(city_model, buildings=None):
-
-    prj = Project(load_data=True)
-    prj.name = city_model.name
-    buildings_not_generated = []
-    e_win_all = []
-
-    if buildings is None:
-        for building in city_model.city_object_member.filter(
-            objectclass=ObjectClass.objects.get(classname="Building")
-        ):
-            buildings_not_generated, e_win = _import_building_window(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
-            e_win_all.append(e_win)
-
-    else:
-        for building in buildings:
-            buildings_not_generated, e_win = _import_building_window(
-                building_energy=building.building_obj.building_energy_obj,
-                project=prj,
-                buildings_not_generated=buildings_not_generated,
-            )
-            e_win_all.append(e_win)
+from teaser_citydb.models import mapping_registry
+import teaser_citydb.teaser_api.prefetch_buildings as prefetch
+import teaser_citydb.teaser_api.import_buildings as import_buildings
+import teaser_citydb.teaser_api.footprint_facades as footprint_facades
+import teaser_citydb.teaser_api.window_areas as window_area_sums
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+import teaser_citydb.teaser_api.archetypes as archetypes
+
+
+def to_teaser_window(
+    city_model, buildings=None, workers=None, bbox=None, polygon=None, cache_dir=None
+):
+
+    prj = teaser_data.new_project(name=city_model.name)
+    buildings_not_generated, e_win_all = import_buildings.import_buildings(
+        import_function=_import_building_window,
+        project=prj,
+        city_model=city_model,
+        buildings=buildings,
+        lookups=prefetch.WINDOW_LOOKUPS,
+        workers=workers,
+        bbox=bbox,
+        polygon=polygon,
+        cache_dir=cache_dir,
+        annotations=[
+            footprint_facades.annotate_footprint_facades,
+            window_area_sums.annotate_window_areas,
+        ],
+    )
 
     return prj, buildings_not_generated, e_win_all
 
@@ -76,11 +42,11 @@ def _import_building_window(building_energy, project, buildings_not_generated):
         buildings_not_generated.append(building_energy.gmlid)
         return buildings_not_generated
 
-    if BWZKMapping.objects.get(bwzk=building_energy.function).archetype is not None:
+    if mapping_registry.get_archetype(building_energy.function) is not None:
         print("Import {} to Teaser".format(building_energy.gmlid))
-        bl_class = BUILDING_CLASS[
-            BWZKMapping.objects.get(bwzk=building_energy.function).archetype
-        ]["teaser_class"]
+        bl_class = archetypes.get_archetype_class(
+            mapping_registry.get_archetype(building_energy.function)
+        )
         bldg = bl_class(
             parent=project,
             name=building_energy.gmlid,
@@ -95,55 +61,26 @@ def _import_building_window(building_energy, project, buildings_not_generated):
             internal_gains_mode=2,
         )
 
-        footprint = (
-            building_energy.bldg_thematic_surface.first()
-            .thematic_surface_geom.first()
-            .geometry
+        footprint_area, facade = footprint_facades.get_building_facade(
+            building_energy, building_energy.measured_height
         )
         bldg.net_leased_area = (
-            footprint.area * int(building_energy.storeys_above_ground) * 0.85
+            footprint_area * int(building_energy.storeys_above_ground) * 0.85
         )
-
-        multi_line = []
-        for ring in footprint:
-            for i, point in enumerate(ring):
-                try:
-                    multi_line.append(LineString(point, ring[i + 1]))
-                except IndexError:
-                    pass
-        facade = {}
-        total_area = 0.0
-        for i, line in enumerate(multi_line):
-
-            if tt_geom._get_orientation(line) in facade.keys():
-                facade[tt_geom._get_orientation(line)] += (
-                    line.length * building_energy.measured_height
-                )
-            else:
-                facade[tt_geom._get_orientation(line)] = (
-                    line.length * building_energy.measured_height
-                )
-            total_area += line.length * building_energy.measured_height
+        total_area = sum(facade.values())
 
         outer_wall_gml = {}
         window_gml = {}
+        window_areas, total_win_area = window_area_sums.get_building_window_areas(
+            building_energy
+        )
         no_orientation = True
         for orientation, facade_area in facade.items():
             window_gml["Win_{}".format(orientation)] = {
-                "area": 0.0,
+                "area": window_areas.get(orientation, 0.0),
                 "orientation": orientation,
                 "tilt": 90,
             }
-            for zone in building_energy.thermal_zones.all():
-                try:
-                    for bound in zone.thermal_boundary_obj.all():
-                        for win in bound.contains.all():
-                            if orientation == float(bound.azimuth):
-                                window_gml["Win_{}".format(orientation)][
-                                    "area"
-                                ] += float(win.area)
-                except TypeError:
-                    no_orientation = True
 
             if no_orientation is False:
                 outer_wall_gml["Wall_{}".format(orientation)] = {
@@ -152,14 +89,6 @@ def _import_building_window(building_energy, project, buildings_not_generated):
                     "orientation": orientation,
                     "tilt": 90,
                 }
-        total_win_area = 0
-        if no_orientation is True:
-            for zone in building_energy.thermal_zones.all():
-                for bound in zone.thermal_boundary_obj.all():
-
-                    for win in bound.contains.all():
-
-                        total_win_area += float(win.area)
 
         for orientation, facade_area in facade.items():
             window_gml["Win_{}".format(orientation)] = {
@@ -188,9 +117,9 @@ def _import_building_window(building_energy, project, buildings_not_generated):
                 }
                 factor_win_gml = bldg.factor_win_gml
 
-        roof_gml = {"Roof": {"area": footprint.area, "orientation": -1, "tilt": 0}}
+        roof_gml = {"Roof": {"area": footprint_area, "orientation": -1, "tilt": 0}}
         ground_floor_gml = {
-            "Ground Floor": {"area": footprint.area, "orientation": -2, "tilt": 0}
+            "Ground Floor": {"area": footprint_area, "orientation": -2, "tilt": 0}
         }
 
         bldg.outer_wall_gml = outer_wall_gml
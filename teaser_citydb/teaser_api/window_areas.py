@@ -0,0 +1,98 @@
+"""Module to aggregate window areas of buildings per azimuth.
+
+The window importers need the area of all openings of a building summed per
+azimuth of the thermal boundary they are contained in, and the total window
+area. Instead of walking zones, boundaries and openings per orientation in
+Python, the areas of a chunk of buildings are summed in the database with one
+grouped query.
+"""
+from django.db.models import Sum
+from citydb.models import EnergyBuilding
+
+AZIMUTH_LOOKUP = "thermal_zones__thermal_boundary_obj__azimuth"
+AREA_LOOKUP = "thermal_zones__thermal_boundary_obj__contains__area"
+
+
+def get_window_areas(building_ids):
+    """Return window areas per azimuth of buildings.
+
+    Parameters
+    ----------
+    building_ids : list or Django QuerySet
+        Primary keys of BuildingEnergy objects
+
+    Returns
+    -------
+    window_areas : dict
+        Dictionary with BuildingEnergy primary key as key and a dictionary
+        of azimuth (float, None if the boundary has no azimuth) and summed
+        window area as value. Buildings without windows are not part of the
+        result.
+
+    """
+    rows = (
+        EnergyBuilding.objects.filter(pk__in=building_ids)
+        .values_list("pk", AZIMUTH_LOOKUP)
+        .annotate(window_area=Sum(AREA_LOOKUP))
+        .order_by()
+    )
+    window_areas = {}
+    for building_id, azimuth, window_area in rows:
+        if window_area is None:
+            continue
+        if azimuth is not None:
+            azimuth = float(azimuth)
+        areas = window_areas.setdefault(building_id, {})
+        areas[azimuth] = areas.get(azimuth, 0.0) + float(window_area)
+    return window_areas
+
+
+def annotate_window_areas(building_energies):
+    """Attach window areas per azimuth to BuildingEnergy objects.
+
+    Sets the attribute window_areas of each building. Used as annotation in
+    prefetch_buildings.iter_building_chunks().
+
+    Parameters
+    ----------
+    building_energies : list
+        List of BuildingEnergy objects
+
+    """
+    window_areas = get_window_areas([bldg.pk for bldg in building_energies])
+    for bldg in building_energies:
+        bldg.window_areas = window_areas.get(bldg.pk, {})
+
+
+def get_building_window_areas(building_energy):
+    """Return window areas per azimuth and total window area of a building.
+
+    Uses the result of annotate_window_areas() if present, otherwise the
+    areas are summed from the related objects of the building.
+
+    Parameters
+    ----------
+    building_energy : BuildingEnergy instance
+        Building the window areas are computed for
+
+    Returns
+    -------
+    window_areas : dict
+        Summed window area per azimuth of the thermal boundaries
+    total_win_area : float
+        Summed area of all windows of the building
+
+    """
+    window_areas = getattr(building_energy, "window_areas", None)
+    if window_areas is None:
+        window_areas = {}
+        for zone in building_energy.thermal_zones.all():
+            for bound in zone.thermal_boundary_obj.all():
+                azimuth = bound.azimuth
+                if azimuth is not None:
+                    azimuth = float(azimuth)
+                for win in bound.contains.all():
+                    window_areas[azimuth] = window_areas.get(azimuth, 0.0) + float(
+                        win.area
+                    )
+    return window_areas, sum(window_areas.values())
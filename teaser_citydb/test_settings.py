@@ -0,0 +1,41 @@
+"""Django settings to run the tests of teaser_citydb.
+
+The tests use two database aliases: the primary ("default") and a replica
+that mirrors the primary, thus the routing of teaser_citydb.routers is used
+as in production without a second database server. The connection of the
+primary is read from environment variables.
+
+Usage:
+
+        $ django-admin test teaser_citydb --settings=teaser_citydb.test_settings
+"""
+import os
+
+SECRET_KEY = "teaser-citydb-tests"
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.gis",
+    "citydb",
+    "teaser_citydb",
+]
+
+_PRIMARY = {
+    "ENGINE": "django.contrib.gis.db.backends.postgis",
+    "NAME": os.environ.get("TEASER_CITYDB_DB_NAME", "citydb"),
+    "USER": os.environ.get("TEASER_CITYDB_DB_USER", "postgres"),
+    "PASSWORD": os.environ.get("TEASER_CITYDB_DB_PASSWORD", ""),
+    "HOST": os.environ.get("TEASER_CITYDB_DB_HOST", "localhost"),
+    "PORT": os.environ.get("TEASER_CITYDB_DB_PORT", "5432"),
+}
+
+DATABASES = {
+    "default": _PRIMARY,
+    "replica": dict(_PRIMARY, TEST={"MIRROR": "default"}),
+}
+DATABASE_ROUTERS = ["teaser_citydb.routers.ReplicaRouter"]
+TEASER_CITYDB_REPLICA = "replica"
+TEASER_CITYDB_PRIMARY = "default"
+
+USE_TZ = False
@@ -1,3 +1,619 @@
+"""Tests of teaser_citydb, run with teaser_citydb.test_settings."""
+
+import datetime
+import json
+import math
+import os
+import struct
+import tempfile
+from collections import namedtuple
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase
 from django.test import TestCase
+from django.test import override_settings
+from teaser.logic.buildingobjects.building import Building
+from teaser.logic.buildingobjects.thermalzone import ThermalZone
+from teaser.logic.buildingobjects.useconditions import UseConditions
+from citydb.models import Construction
+from citydb.models import EnergyBuilding
+from citydb.models import ObjectClass
+from citydb.models import ThermalBoundary
+from citydb.models import ThermalOpening
+from citydb.models import ThermalZone as ThermalZoneSQL
+from teaser_citydb.models import BWZKMapping
+from teaser_citydb.models import mapping_registry
+from teaser_citydb.routers import ReplicaRouter
+from teaser_citydb.routers import read_from_replica
+import teaser_citydb.teaser_api.archetypes as archetypes
+import teaser_citydb.teaser_api.boundary_table as boundary_table
+import teaser_citydb.teaser_api.footprint_edges as footprint_edges
+import teaser_citydb.teaser_api.footprints as footprints
+import teaser_citydb.teaser_api.hourly_schedules as hourly_schedules
+import teaser_citydb.teaser_api.prevalidation as prevalidation
+import teaser_citydb.teaser_api.snapshot as snapshot
+import teaser_citydb.teaser_api.teaser_data as teaser_data
+import teaser_citydb.teaser_api.to_teaser as to_teaser
+from teaser_citydb.teaser_api.archetype_cache import ArchetypeCache
+from teaser_citydb.teaser_api.layer_cache import LayerCache
+from teaser_citydb.teaser_api.schedule_cache import schedule_cache
+
+# Stand-in for the TimeSeriesFile of a schedule, the values are read from
+# the materialized HourlySchedule
+Series = namedtuple("Series", ["file_id"])
+
+PROFILES = [
+    ("persons_profile", "mean_persons_profile"),
+    ("machines_profile", "mean_machines_profile"),
+    ("lighting_profile", "mean_lighting_profile"),
+    ("heating_profile", "mean_heating_profile"),
+    ("cooling_profile", "mean_cooling_profile"),
+]
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    """Routing of reads and writes between primary and replica."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_read_outside_replica_block(self):
+        self.assertIsNone(self.router.db_for_read(BWZKMapping))
+        self.assertEqual(BWZKMapping.objects.all().db, "default")
+
+    def test_read_inside_replica_block(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(BWZKMapping), "replica")
+            self.assertEqual(BWZKMapping.objects.all().db, "replica")
+        self.assertIsNone(self.router.db_for_read(BWZKMapping))
+
+    def test_nested_replica_blocks(self):
+        with read_from_replica():
+            with read_from_replica():
+                pass
+            self.assertEqual(self.router.db_for_read(BWZKMapping), "replica")
+        self.assertIsNone(self.router.db_for_read(BWZKMapping))
+
+    def test_replica_as_decorator(self):
+        @read_from_replica()
+        def read():
+            return BWZKMapping.objects.all().db
+
+        self.assertEqual(read(), "replica")
+        self.assertEqual(BWZKMapping.objects.all().db, "default")
+
+    def test_write_goes_to_primary(self):
+        self.assertEqual(self.router.db_for_write(BWZKMapping), "default")
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(BWZKMapping), "default")
+
+    def test_allow_migrate(self):
+        self.assertFalse(self.router.allow_migrate("replica", "teaser_citydb"))
+        self.assertIsNone(self.router.allow_migrate("default", "teaser_citydb"))
+
+    @override_settings(TEASER_CITYDB_REPLICA="missing")
+    def test_without_replica(self):
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(BWZKMapping))
+        self.assertIsNone(self.router.allow_migrate("replica", "teaser_citydb"))
+
+
+class ScheduleHandoffTest(TestCase):
+    """Schedules of to_teaser are shared lists TEASER can save and load."""
+
+    def setUp(self):
+        schedule_cache.clear()
+        self.values = [0.0, 0.5, 1.0] * 2920
+        hourly_schedules.store_hourly_schedule("test_schedule", self.values)
+        self.series = Series(file_id="test_schedule")
+
+    def tearDown(self):
+        schedule_cache.clear()
+
+    def test_profile_is_shared_list(self):
+        profile = to_teaser._get_schedule(self.series, "mean_persons_profile")
+        self.assertIsInstance(profile, list)
+        self.assertEqual(profile, self.values)
+        self.assertIs(
+            to_teaser._get_schedule(self.series, "mean_persons_profile"), profile
+        )
+
+    def test_project_can_be_saved_and_loaded(self):
+        prj = teaser_data.new_project(name="schedules")
+        bldg = Building(parent=prj)
+        bldg.name = "test_building"
+        zone = ThermalZone(parent=bldg)
+        zone.name = "test_zone"
+        zone.area = 100.0
+        zone.volume = 300.0
+        zone.use_conditions = UseConditions(parent=zone)
+        for attribute, column in PROFILES:
+            setattr(
+                zone.use_conditions,
+                attribute,
+                to_teaser._get_schedule(self.series, column),
+            )
+
+        with tempfile.TemporaryDirectory() as path:
+            prj.save_project(file_name="schedules", path=path)
+            loaded = teaser_data.new_project()
+            loaded.load_project(os.path.join(path, "schedules.json"))
+
+        use_conditions = loaded.buildings[0].thermal_zones[0].use_conditions
+        for attribute, _ in PROFILES:
+            self.assertEqual(list(getattr(use_conditions, attribute)), self.values)
+
+    def test_calculation_keeps_profiles(self):
+        prj = teaser_data.new_project(name="schedules")
+        for name in ["first_building", "second_building"]:
+            bldg = archetypes.get_archetype_class("Office")(
+                parent=prj,
+                name=name,
+                year_of_construction=1990,
+                net_leased_area=500.0,
+                number_of_floors=2,
+                height_of_floors=3.0,
+            )
+            bldg.generate_archetype()
+            for zone in bldg.thermal_zones:
+                for attribute, column in PROFILES:
+                    setattr(
+                        zone.use_conditions,
+                        attribute,
+                        to_teaser._get_schedule(self.series, column),
+                    )
+
+        prj.calc_all_buildings()
+
+        for bldg in prj.buildings:
+            for zone in bldg.thermal_zones:
+                for attribute, _ in PROFILES:
+                    self.assertEqual(
+                        getattr(zone.use_conditions, attribute), self.values
+                    )
+        for _, column in PROFILES:
+            self.assertEqual(to_teaser._get_schedule(self.series, column), self.values)
+
+
+class FootprintEdgesTest(SimpleTestCase):
+    """Vectorized edge orientations match the scalar get_orientation()."""
+
+    def assert_matches_scalar(self, ring):
+        ring = np.asarray(ring, dtype=float)
+        _, orientations, _ = footprint_edges.get_footprint_edges([[ring]])
+        expected = [
+            footprint_edges.get_orientation((ring[i], ring[i + 1]))
+            for i in range(len(ring) - 1)
+        ]
+        self.assertEqual(orientations.tolist(), expected)
+
+    def test_half_degree_ties(self):
+        # edges at every half degree, the rounding ties of the normal
+        for angle in np.arange(-180.0, 180.5, 0.5).tolist():
+            for length in [1.0, 7.3, 1000.0]:
+                end = (
+                    length * math.cos(math.radians(angle)),
+                    length * math.sin(math.radians(angle)),
+                )
+                self.assert_matches_scalar([(0.0, 0.0), end])
+
+    def test_random_footprints(self):
+        random = np.random.RandomState(0)
+        for _ in range(500):
+            points = random.uniform(0.0, 100.0, size=(8, 2))
+            self.assert_matches_scalar(np.vstack([points, points[:1]]))
+
+    def test_snap_orientations(self):
+        normals = [0.0, 180.0, -5.0, -45.0, 90.0, -90.0, -33.0, 100.0]
+        self.assertEqual(
+            footprint_edges.snap_orientations(normals).tolist(),
+            [0.0, 180.0, 0.0, 45.0, 270.0, 90.0, 33.0, 260.0],
+        )
+        self.assertEqual(
+            footprint_edges.snap_orientations(normals, bins=[]).tolist(),
+            [0.0, 180.0, 5.0, 45.0, 270.0, 90.0, 33.0, 260.0],
+        )
+
+
+class ClassifyTest(SimpleTestCase):
+    """Classification of buildings before the error-tolerant import."""
+
+    def setUp(self):
+        mapping_registry.set_mappings({"1300": "Office", "2000": None}, {})
+        self.boundary_types = {"OuterWall", "Roof", "GroundSlab"}
+
+    def tearDown(self):
+        mapping_registry.invalidate()
+
+    def test_element_complete(self):
+        self.assertEqual(
+            prevalidation.classify("1300", 2, 6.0, self.boundary_types),
+            prevalidation.ELEMENT_COMPLETE,
+        )
+
+    def test_geometry_only(self):
+        self.assertEqual(
+            prevalidation.classify("1300", 2, 6.0, {"OuterWall"}),
+            prevalidation.GEOMETRY_ONLY,
+        )
+
+    def test_invalid_height(self):
+        self.assertEqual(
+            prevalidation.classify("1300", 0, 6.0, self.boundary_types),
+            prevalidation.INVALID_HEIGHT,
+        )
+        self.assertEqual(
+            prevalidation.classify("1300", 2, None, self.boundary_types),
+            prevalidation.INVALID_HEIGHT,
+        )
+
+    def test_code_without_archetype(self):
+        self.assertEqual(
+            prevalidation.classify("2000", 2, 6.0, self.boundary_types),
+            prevalidation.UNMAPPABLE,
+        )
+
+    def test_unknown_code(self):
+        self.assertEqual(
+            prevalidation.classify("9999", 2, 6.0, self.boundary_types),
+            prevalidation.UNMAPPABLE,
+        )
+
+
+def _wkb_polygon(rings, byte_order="<", geometry_type=3, dimensions=2, srid=None):
+    """Return the WKB of a polygon, with SRID if given (EWKB)."""
+    wkb = struct.pack("B", 1 if byte_order == "<" else 0)
+    if srid is None:
+        wkb += struct.pack(byte_order + "I", geometry_type)
+    else:
+        wkb += struct.pack(byte_order + "II", geometry_type | 0x20000000, srid)
+    wkb += struct.pack(byte_order + "I", len(rings))
+    for ring in rings:
+        wkb += struct.pack(byte_order + "I", len(ring))
+        for point in ring:
+            point = (list(point) + [10.0, 20.0])[:dimensions]
+            wkb += struct.pack(byte_order + "d" * dimensions, *point)
+    return wkb
+
+
+class ParseWkbTest(SimpleTestCase):
+    """Parsing of footprints from ISO WKB and extended WKB."""
+
+    exterior = [(0.0, 0.0), (10.0, 0.0), (10.0, 5.0), (0.0, 5.0), (0.0, 0.0)]
+    hole = [(1.0, 1.0), (1.0, 2.0), (2.0, 2.0), (2.0, 1.0), (1.0, 1.0)]
+
+    def assert_polygons(self, polygons, expected):
+        self.assertEqual(len(polygons), len(expected))
+        for rings, expected_rings in zip(polygons, expected):
+            self.assertEqual(len(rings), len(expected_rings))
+            for ring, expected_ring in zip(rings, expected_rings):
+                self.assertEqual(ring.tolist(), [list(p) for p in expected_ring])
+
+    def test_iso_polygon(self):
+        wkb = _wkb_polygon([self.exterior, self.hole])
+        self.assert_polygons(footprints.parse_wkb(wkb), [[self.exterior, self.hole]])
+
+    def test_iso_polygon_z_and_zm(self):
+        for geometry_type, dimensions in [(1003, 3), (2003, 3), (3003, 4)]:
+            wkb = _wkb_polygon(
+                [self.exterior], geometry_type=geometry_type, dimensions=dimensions
+            )
+            self.assert_polygons(footprints.parse_wkb(wkb), [[self.exterior]])
+
+    def test_big_endian(self):
+        wkb = _wkb_polygon([self.exterior], byte_order=">")
+        self.assert_polygons(footprints.parse_wkb(wkb), [[self.exterior]])
+
+    def test_ewkb_with_z_and_srid(self):
+        wkb = _wkb_polygon(
+            [self.exterior], geometry_type=3 | 0x80000000, dimensions=3, srid=25832
+        )
+        self.assert_polygons(footprints.parse_wkb(wkb), [[self.exterior]])
+
+    def test_multipolygon(self):
+        polygons = [
+            _wkb_polygon([self.exterior], geometry_type=1003, dimensions=3),
+            _wkb_polygon([self.hole], byte_order=">"),
+        ]
+        wkb = struct.pack("<BII", 1, 6, len(polygons)) + b"".join(polygons)
+        self.assert_polygons(footprints.parse_wkb(wkb), [[self.exterior], [self.hole]])
+
+    def test_footprint_shape(self):
+        polygons = footprints.parse_wkb(_wkb_polygon([self.exterior, self.hole]))
+        rings, area, length = footprints.get_footprint_shape(polygons)
+        self.assertEqual(len(rings), 2)
+        self.assertAlmostEqual(area, 49.0)
+        self.assertAlmostEqual(length, 34.0)
+
+    def test_no_polygon(self):
+        with self.assertRaises(ValueError):
+            footprints.parse_wkb(struct.pack("<BIdd", 1, 1, 0.0, 0.0))
+
+
+class _Construction(object):
+    """Construction with precomputed layer description, as in snapshots."""
+
+    def __init__(self, pk, layer_description):
+        self.pk = pk
+        self.layer_description = layer_description
+
+
+class LayerCacheTest(SimpleTestCase):
+    """Layer descriptions are built once per construction and copied."""
+
+    def setUp(self):
+        self.cache = LayerCache()
+        self.description = {
+            0: {"position": 0, "thickness": 0.2, "material": "Concrete"}
+        }
+
+    def test_hits_and_misses(self):
+        construction = _Construction(1, self.description)
+        self.cache.get_layers(construction)
+        self.cache.get_layers(construction)
+        self.cache.get_layers(_Construction(2, None))
+        info = self.cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+
+    def test_result_is_copy(self):
+        construction = _Construction(1, self.description)
+        layers = self.cache.get_layers(construction)
+        layers[0]["thickness"] = 1.0
+        layers[1] = {}
+        self.assertEqual(self.cache.get_layers(construction), self.description)
+
+    def test_without_layers(self):
+        self.assertIsNone(self.cache.get_layers(_Construction(3, None)))
+        self.assertIsNone(self.cache.get_layers(_Construction(3, None)))
+
+    def test_clear(self):
+        self.cache.get_layers(_Construction(1, self.description))
+        self.cache.clear()
+        info = self.cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 0, 0))
+
+
+class _Project(object):
+    """Project with shared data, the data must not be copied."""
+
+    def __init__(self):
+        self.data = {"materials": ["Concrete"]}
+        self.buildings = []
+
+
+class _Archetype(object):
+    """Archetype class that counts generate_archetype() calls."""
+
+    generated = 0
+
+    def __init__(self, parent, name, **kwargs):
+        self.parent = parent
+        self.name = name
+        self.kwargs = kwargs
+        self.walls = []
+
+    def generate_archetype(self):
+        _Archetype.generated += 1
+        self.walls = [{"area": self.kwargs["net_leased_area"]}]
+
+
+class ArchetypeCacheTest(SimpleTestCase):
+    """Archetypes are generated once per key, further buildings are copies."""
+
+    def setUp(self):
+        _Archetype.generated = 0
+        self.cache = ArchetypeCache()
+        self.project = _Project()
+
+    def generate(self, name, net_leased_area=100.0):
+        return self.cache.generate_archetype(
+            _Archetype,
+            project=self.project,
+            name=name,
+            year_of_construction=1990,
+            net_leased_area=net_leased_area,
+        )
+
+    def test_hits_and_misses(self):
+        self.generate("a")
+        self.generate("b")
+        self.generate("c", net_leased_area=200.0)
+        info = self.cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+        self.assertEqual(_Archetype.generated, 2)
+
+    def test_copy_is_independent(self):
+        first = self.generate("a")
+        second = self.generate("b")
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, "b")
+        self.assertEqual(second.walls, first.walls)
+        second.walls[0]["area"] = 1.0
+        self.assertEqual(self.generate("c").walls[0]["area"], 100.0)
+
+    def test_copy_shares_project(self):
+        self.generate("a")
+        second = self.generate("b")
+        self.assertIs(second.parent, self.project)
+        self.assertIs(second.parent.data, self.project.data)
+
+
+class BoundaryTableTest(TestCase):
+    """get_boundary_tables() matches the per-boundary scaling of importers."""
+
+    def setUp(self):
+        self.building = EnergyBuilding(
+            objectclass=ObjectClass.objects.get(classname="Building"),
+            gmlid="test_building",
+            name="test_building",
+            year_of_construction=datetime.date(1990, 1, 1),
+            measured_height=6.0,
+            measured_height_unit="m",
+            storeys_above_ground=2,
+            storey_heights_above_ground=3.0,
+            function="1300",
+            building_type="Office",
+            construction_weight="heavy",
+        )
+        self.building.save()
+        self.building.floor_area = 200.0
+        self.building.save()
+
+        first_zone = self.create_zone("first", 100.0)
+        wall = self.create_boundary(first_zone, "outerWall", 10.0, 90.0, 90.0, 1.0)
+        self.create_opening(wall, "window_1", 2.0, 2.5)
+        self.create_opening(wall, "window_2", 1.0, 1.5)
+        self.create_boundary(first_zone, "roof", 50.0, None, 0.0, 0.5)
+        self.create_boundary(first_zone, "outerWall", 5.0, 180.0, 90.0, 1.0)
+        second_zone = self.create_zone("second", 50.0)
+        self.create_boundary(second_zone, "outerWall", 99.0, 0.0, 90.0, 1.0)
+
+    def create_zone(self, name, floor_area):
+        zone = ThermalZoneSQL(
+            gmlid="ThermalZone_{}".format(name),
+            name="ThermalZone_{}".format(name),
+            objectclass=ObjectClass.objects.get(classname="ThermalZone"),
+            building=self.building,
+        )
+        zone.save()
+        zone.floor_area = floor_area
+        zone.save()
+        return zone
+
+    def create_construction(self, name, u_value):
+        construction = Construction(
+            objectclass=ObjectClass.objects.get(classname="Construction"),
+            gmlid="Construction_{}".format(name),
+            name="Construction_{}".format(name),
+            u_value=u_value,
+            u_value_uom="W/(m2*K)",
+        )
+        construction.save()
+        return construction
+
+    def create_boundary(self, zone, tb_type, area, azimuth, tilt, u_value):
+        name = "{}_{}_{}".format(zone.name, tb_type, area)
+        bound = ThermalBoundary(
+            objectclass=ObjectClass.objects.get(classname="ThermalBoundary"),
+            name=name,
+            gmlid=name,
+            area=area,
+            area_uom="m2",
+            azimuth=azimuth,
+            azimuth_uom="deg",
+            inclination=tilt,
+            inclination_uom="deg",
+            thermal_boundary_type=tb_type,
+        )
+        bound.save()
+        bound.delimites.add(zone)
+        bound.construction = self.create_construction(name, u_value)
+        bound.save()
+        return bound
+
+    def create_opening(self, bound, name, area, u_value):
+        opening = ThermalOpening(
+            gmlid=name,
+            name=name,
+            objectclass=ObjectClass.objects.get(classname="ThermalOpening"),
+            area=area,
+            area_uom="m2",
+        )
+        opening.save()
+        opening.thermal_boundary = bound
+        opening.construction = self.create_construction(name, u_value)
+        opening.save()
+
+    def get_expected(self):
+        """Return the table computed boundary by boundary with the ORM."""
+        building_area = float(self.building.floor_area)
+        zone = self.building.thermal_zones.order_by("pk").first()
+        factor = float(zone.floor_area) / building_area
+        expected = {}
+        for bound in zone.thermal_boundary_obj.order_by("pk"):
+            windows = [
+                (float(win.area) / factor, float(win.construction.u_value))
+                for win in bound.contains.order_by("pk")
+            ]
+            expected.setdefault(bound.thermal_boundary_type, []).append(
+                (
+                    bound.pk,
+                    float(bound.area) / factor,
+                    None if bound.azimuth is None else float(bound.azimuth),
+                    float(bound.inclination),
+                    float(bound.construction.u_value),
+                    windows,
+                )
+            )
+        return expected
+
+    def test_scaling_and_first_zone(self):
+        table = boundary_table.get_boundary_tables([self.building.pk])[self.building.pk]
+        result = {
+            bound_type: [
+                (
+                    row.pk,
+                    row.area,
+                    row.azimuth,
+                    row.tilt,
+                    row.u_value,
+                    [(win.area, win.u_value) for win in row.windows],
+                )
+                for row in rows
+            ]
+            for bound_type, rows in table.items()
+        }
+        self.assertEqual(list(table.keys()), ["outerWall", "roof"])
+        self.assertEqual(result, self.get_expected())
+        self.assertEqual([row.area for row in table["outerWall"]], [20.0, 10.0])
+        self.assertEqual(
+            [(win.area, win.u_value) for win in table["outerWall"][0].windows],
+            [(4.0, 2.5), (2.0, 1.5)],
+        )
+        self.assertIsNone(table["roof"][0].azimuth)
+
+    def test_building_without_zones(self):
+        self.assertEqual(boundary_table.get_boundary_tables([-1]), {})
+
+
+def _snapshot_record(gmlid, footprint=None):
+    """Return a snapshot row of an office building without boundaries."""
+    return {
+        "pk": 1,
+        "gmlid": gmlid,
+        "function": "1300",
+        "year_of_construction": 1990,
+        "storeys_above_ground": 2,
+        "measured_height": 6.0,
+        "floor_area": 200.0,
+        "building_class": prevalidation.GEOMETRY_ONLY,
+        "footprint": json.dumps(footprint),
+        "facade": json.dumps(None),
+        "window_areas": json.dumps([]),
+        "zones": json.dumps([[200.0, None]]),
+        "boundaries": json.dumps([]),
+    }
+
+
+class SnapshotTest(SimpleTestCase):
+    """Import of snapshot buildings without database."""
+
+    def import_snapshot(self, mode):
+        buildings = [snapshot.SnapshotBuilding(_snapshot_record("no_footprint"))]
+        read_result = ("test", buildings, ({"1300": "Office"}, {}))
+        with mock.patch.object(snapshot, "read_snapshot", return_value=read_result):
+            return snapshot.to_teaser_snapshot("test.parquet", mode=mode)
+
+    def test_archetype(self):
+        prj, buildings_not_generated = self.import_snapshot("archetype")
+        self.assertEqual(buildings_not_generated, [])
+        self.assertEqual([bldg.name for bldg in prj.buildings], ["no_footprint"])
 
-# Create your tests here.
+    def test_missing_footprint(self):
+        for mode in snapshot.SNAPSHOT_MODES:
+            if mode == "archetype":
+                continue
+            with self.subTest(mode=mode):
+                prj, buildings_not_generated = self.import_snapshot(mode)
+                self.assertEqual(buildings_not_generated, ["no_footprint"])
+                self.assertEqual(prj.buildings, [])